@@ -0,0 +1,92 @@
+"""Servidor HTTP que imita el endpoint SQL de CrateDB (/_sql) con lecturas en memoria.
+
+Responde solo las consultas que hace databaseloadjob sobre doc.etvariables (la página por
+entity_id y time_index y el listado de entidades), con el formato de respuesta de CrateDB.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+PATRON_PAGINA = re.compile(r"WHERE\s+entity_id\s*=\s*\?\s+AND\s+time_index\s*>\s*\?", re.IGNORECASE)
+PATRON_ENTIDADES = re.compile(r"GROUP\s+BY\s+entity_id", re.IGNORECASE)
+
+
+class CrateStub:
+
+    # lecturas: entidad -> (time_index_ms, temp, humedad) como las entrega generator.generar_lecturas
+    def __init__(self, lecturas, host="127.0.0.1", puerto=0):
+        self.lecturas = lecturas
+        self.consultas = 0
+        self._servidor = ThreadingHTTPServer((host, puerto), self._crear_manejador())
+        self._hilo = None
+
+    @property
+    def url(self):
+        host, puerto = self._servidor.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def ejecutar(self, sentencia, argumentos):
+        self.consultas += 1
+        if PATRON_PAGINA.search(sentencia):
+            entidad, ultimo_ms, limite = argumentos
+            time_index, temp, humedad = self.lecturas.get(entidad, (np.empty(0, np.int64), np.empty(0), np.empty(0)))
+            i = np.searchsorted(time_index, ultimo_ms, side="right")
+            j = min(i + int(limite), len(time_index))
+            filas = [list(fila) for fila in zip(time_index[i:j].tolist(), temp[i:j].tolist(), humedad[i:j].tolist())]
+            return ["time_index", "temp", "humedad"], filas
+        if PATRON_ENTIDADES.search(sentencia):
+            return ["entity_id"], [[entidad] for entidad in sorted(self.lecturas)]
+        raise ValueError(f"Consulta no soportada por el stub: {sentencia.strip()}")
+
+    def _crear_manejador(self):
+        stub = self
+
+        class Manejador(BaseHTTPRequestHandler):
+
+            def _responder(self, codigo, cuerpo):
+                datos = json.dumps(cuerpo).encode("utf-8")
+                self.send_response(codigo)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+            # El cliente de crate consulta la versión del servidor al conectarse
+            def do_GET(self):
+                self._responder(200, {
+                    "ok": True, "status": 200, "name": "crate-stub", "cluster_name": "benchmark",
+                    "version": {"number": "5.6.0", "build_hash": "stub", "build_snapshot": False, "lucene_version": "9.9.0"},
+                })
+
+            def do_POST(self):
+                inicio = time.perf_counter()
+                cuerpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                try:
+                    columnas, filas = stub.ejecutar(cuerpo.get("stmt", ""), cuerpo.get("args", []))
+                except ValueError as e:
+                    self._responder(400, {"error": {"message": str(e), "code": 4000}})
+                    return
+                self._responder(200, {
+                    "cols": columnas,
+                    "rows": filas,
+                    "rowcount": len(filas),
+                    "duration": (time.perf_counter() - inicio) * 1000,
+                })
+
+            def log_message(self, formato, *args):
+                pass
+
+        return Manejador
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, name="crate-stub", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
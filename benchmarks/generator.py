@@ -0,0 +1,47 @@
+"""Generador determinista de lecturas de temperatura y humedad para los benchmarks.
+
+Con la misma semilla y los mismos parámetros produce siempre las mismas lecturas, con el mismo formato
+que doc.etvariables en CrateDB: time_index en milisegundos, temp y humedad.
+"""
+from datetime import datetime
+
+import numpy as np
+
+# Inicio fijo para que los datos no dependan del día en que se corre el benchmark
+INICIO = datetime(2024, 1, 1)
+
+
+def nombre_sensor(i):
+    return f"sensor{i:03d}"
+
+
+# Devuelve entidad -> (time_index_ms, temp, humedad), arreglos ordenados por time_index.
+# tasa_huecos: fracción aproximada de lecturas perdidas, en huecos de largo_hueco lecturas seguidas
+def generar_lecturas(n_sensores, dias, intervalo_s=60, tasa_huecos=0.0, largo_hueco=30, inicio=INICIO, semilla=123):
+    rng = np.random.default_rng(semilla)
+    n = int(dias * 86400 // intervalo_s)
+    segundos = np.arange(n, dtype=np.int64) * intervalo_s
+    time_index = int(inicio.timestamp() * 1000) + segundos * 1000
+    hora_del_dia = (segundos % 86400) / 3600.0
+    dia = segundos / 86400.0
+
+    lecturas = {}
+    for i in range(n_sensores):
+        fase = rng.uniform(0, 2 * np.pi)
+        base = rng.uniform(16, 24)
+        ciclo = np.sin(2 * np.pi * hora_del_dia / 24 + fase)
+        # Ciclo diario, deriva lenta de varios días y ruido del sensor
+        temp = base + 5 * ciclo + 1.5 * np.sin(2 * np.pi * dia / 7) + rng.normal(0, 0.3, n)
+        humedad = np.clip(65 - 12 * ciclo + rng.normal(0, 1.0, n), 0, 100)
+
+        conservar = np.ones(n, dtype=bool)
+        if tasa_huecos > 0:
+            bloques = -(-n // largo_hueco)
+            perdidos = rng.random(bloques) < tasa_huecos
+            conservar = ~np.repeat(perdidos, largo_hueco)[:n]
+        lecturas[nombre_sensor(i)] = (time_index[conservar], np.round(temp[conservar], 2), np.round(humedad[conservar], 2))
+    return lecturas
+
+
+def total_lecturas(lecturas):
+    return sum(len(time_index) for time_index, _, _ in lecturas.values())
@@ -0,0 +1,55 @@
+"""PostgreSQL desechable para los benchmarks.
+
+Crea un cluster nuevo con initdb en un directorio temporal, lo levanta con pg_ctl escuchando solo en
+un socket Unix dentro de ese directorio y lo borra al terminar. Necesita los binarios de PostgreSQL
+(initdb, pg_ctl) en el PATH.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+
+USUARIO = "bench"
+
+# Tablas que en producción ya existen antes de que corran los jobs (los jobs solo les agregan columnas);
+# la tabla de lecturas la crea databaseloadjob
+ESQUEMA_BASE = """
+    CREATE TABLE IF NOT EXISTS predictions (temperature DOUBLE PRECISION, humidity DOUBLE PRECISION, timestamp TIMESTAMP);
+    CREATE TABLE IF NOT EXISTS model_accuracy (
+        model TEXT, mae DOUBLE PRECISION, mape DOUBLE PRECISION, mse DOUBLE PRECISION, rmse DOUBLE PRECISION,
+        timestamp TIMESTAMP
+    );
+"""
+
+
+# Devuelve los parámetros de conexión para psycopg2.connect
+@contextmanager
+def postgres_temporal(puerto=54329):
+    for binario in ("initdb", "pg_ctl"):
+        if shutil.which(binario) is None:
+            raise RuntimeError(f"No se encontró {binario} en el PATH; use --dsn con un PostgreSQL existente")
+
+    directorio = tempfile.mkdtemp(prefix="bench_pg_")
+    datos = os.path.join(directorio, "datos")
+    registro = os.path.join(directorio, "postgres.log")
+    subprocess.run(
+        ["initdb", "-D", datos, "-U", USUARIO, "--auth=trust", "-E", "UTF8"],
+        check=True, stdout=subprocess.DEVNULL
+    )
+    subprocess.run(
+        ["pg_ctl", "-D", datos, "-l", registro, "-w",
+         "-o", f"-p {puerto} -k {directorio} -c listen_addresses=''", "start"],
+        check=True, stdout=subprocess.DEVNULL
+    )
+    try:
+        yield {"host": directorio, "port": puerto, "user": USUARIO, "dbname": "postgres"}
+    finally:
+        subprocess.run(["pg_ctl", "-D", datos, "-m", "fast", "-w", "stop"], stdout=subprocess.DEVNULL)
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def crear_esquema_base(conexion):
+    with conexion.cursor() as cursor:
+        cursor.execute(ESQUEMA_BASE)
+    conexion.commit()
@@ -0,0 +1,317 @@
+"""Benchmark de punta a punta con datos sintéticos.
+
+Genera lecturas deterministas, las sirve con un stub del endpoint SQL de CrateDB y mide, contra un
+PostgreSQL desechable (o el indicado con --dsn):
+
+- databaseloadjob: carga completa e incremental con sincronizar_entidad (extracción paginada, COPY, rollup y
+  checkpoint) y el archivo en Parquet de los días cerrados
+- predictionjob: lectura de la historia (archivo y resumen horario), completado de huecos, ejecutar_series con el
+  pool de procesos y la caché de modelos, y publicación
+- dashboard: la carga inicial de iniciar(), datos_fecha y el callback actualizar_visualizacion, con y sin la
+  caché de figuras
+
+Se llaman las funciones de los jobs y del dashboard, no copias de su lógica.
+
+El resultado es un JSON con claves ordenadas para poder compararlo entre commits.
+
+Ejemplo: python benchmarks/run.py --sensores 4 --dias 30 --tasa-huecos 0.02 --salida reporte.json
+"""
+import argparse
+import json
+import os
+import importlib.util
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for carpeta in ("shared", "frontend/dash", "middleware/predictionjob", "middleware/databaseloadjob"):
+    sys.path.insert(0, os.path.join(RAIZ, carpeta))
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import sklearn
+from crate import client
+
+# databaseloadjob
+from archive import archivar_rollup
+from checkpoint import crear_tabla_checkpoint
+from extractor import descubrir_entidades
+from partitions import asegurar_particiones
+from schema import crear_tabla_lecturas, crear_tabla_rollup
+from sync import sincronizar_entidad
+# predictionjob
+from pipeline import completar_entidades, leer_historia, predecir_entidades
+from publisher import crear_tablas_publicacion, publicar_predicciones
+
+from crate_stub import CrateStub
+from generator import INICIO, generar_lecturas, total_lecturas
+from postgres_temporal import crear_esquema_base, postgres_temporal
+
+TABLA_LECTURAS = "readings"
+TABLA_HORARIA = "hourly_readings"
+TABLA_PREDICCIONES = "predictions"
+TABLA_CORRIDAS = "prediction_runs"
+TABLA_VIGENTE = "prediction_current"
+VISTA_VIGENTE = "current_predictions"
+VARIABLES = ["temperature", "humidity"]
+# Días recientes que no se archivan, como ARCHIVO_MARGEN_DIAS en databaseloadjob
+MARGEN_ARCHIVO_DIAS = 1
+
+
+@contextmanager
+def cronometro(resultado, clave):
+    inicio = time.perf_counter()
+    yield
+    resultado[clave] = time.perf_counter() - inicio
+
+
+def percentiles_ms(tiempos):
+    tiempos = np.asarray(tiempos) * 1000
+    return {"p50_ms": float(np.median(tiempos)), "p95_ms": float(np.percentile(tiempos, 95)), "n": len(tiempos)}
+
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- databaseloadjob ---
+
+def medir_carga(conectar, crate_url, archivo_dir, args):
+    conexion = conectar()
+    with conexion.cursor() as cursor:
+        # Particiones mensuales para todo el rango de los datos sintéticos, como las deja el job en producción
+        crear_tabla_lecturas(cursor, TABLA_LECTURAS)
+        asegurar_particiones(cursor, TABLA_LECTURAS, INICIO.date(), (INICIO + timedelta(days=args.dias)).date())
+        crear_tabla_checkpoint(cursor)
+        crear_tabla_rollup(cursor, TABLA_HORARIA)
+    conexion.commit()
+
+    def conectar_crate():
+        return client.connect(crate_url)
+
+    crate_conn = conectar_crate()
+    entidades = descubrir_entidades(crate_conn.cursor())
+    crate_conn.close()
+
+    # Cada entidad por sincronizar_entidad de databaseloadjob, en su propio hilo como en el job
+    resultado = {}
+    for etapa in ("completa", "incremental"):
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            filas = sum(n_filas for n_filas, _ in pool.map(
+                lambda entidad: sincronizar_entidad(conectar, conectar_crate, entidad, TABLA_LECTURAS, TABLA_HORARIA,
+                                                    args.modo_carga, args.tam_pagina),
+                entidades
+            ))
+        segundos = time.perf_counter() - inicio
+        resultado[etapa] = {"segundos": segundos, "filas": filas, "filas_por_segundo": filas / segundos if segundos else None}
+        print(f"Carga {etapa}: {filas} filas en {segundos:.2f} s")
+
+    # Archivo de los días cerrados, como al final del job; el día siguiente a los datos sintéticos hace de hoy
+    hoy = (INICIO + timedelta(days=args.dias)).date()
+    with cronometro(resultado, "archivo_s"):
+        with conexion.cursor() as cursor:
+            archivadas, _ = archivar_rollup(cursor, TABLA_HORARIA, archivo_dir, hoy - timedelta(days=MARGEN_ARCHIVO_DIAS))
+    conexion.close()
+    resultado["archivo_horas"] = sum(archivadas.values())
+    print(f"Archivo: {resultado['archivo_horas']} horas en {resultado['archivo_s']:.2f} s")
+    return resultado
+
+
+# --- predictionjob ---
+
+def medir_prediccion(conectar, archivo_dir, args):
+    resultado = {}
+    conexion = conectar()
+    cursor = conexion.cursor()
+
+    # Preprocesamiento: historia del archivo y del resumen horario y completado de huecos por entidad, con las
+    # mismas funciones que predictionjob
+    with cronometro(resultado, "preprocesamiento_s"):
+        df_lecturas = leer_historia(cursor, TABLA_HORARIA, None, args.historia_dias, archivo_dir,
+                                    ahora=INICIO + timedelta(days=args.dias))
+        df_completos = completar_entidades(df_lecturas, VARIABLES, args.historia_dias)
+
+    # Entrenamiento (selección de modelo con origen móvil y ajuste final) y predicción por ejecutar_series, con el
+    # pool de procesos y la caché de modelos: la primera corrida entrena todo y la segunda, con los mismos datos,
+    # mide la corrida que sale de la caché
+    cache_dir = tempfile.mkdtemp(prefix="bench_modelos_")
+    try:
+        with cronometro(resultado, "entrenamiento_prediccion_s"):
+            resultados, df_futuro = predecir_entidades(
+                df_completos, VARIABLES, "por_serie", args.max_lags, cache_dir, args.presupuesto_cpu,
+                args.max_procesos, args.candidatos, args.presupuesto
+            )
+        with cronometro(resultado, "entrenamiento_prediccion_cache_s"):
+            predecir_entidades(
+                df_completos, VARIABLES, "por_serie", args.max_lags, cache_dir, args.presupuesto_cpu,
+                args.max_procesos, args.candidatos, args.presupuesto
+            )
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    modelos = {}
+    for serie in resultados.values():
+        modelos[serie["metricas"]["modelo"]] = modelos.get(serie["metricas"]["modelo"], 0) + 1
+    resultado.update({
+        "series": len(resultados),
+        # Suma por serie de la selección de modelo y el reentrenamiento (lo que devuelve ejecutar_serie, no el fit
+        # medio por fold del candidato elegido) y de la predicción de 24 horas, en la corrida sin caché
+        "entrenamiento_s": sum(serie["tiempo_fit"] for serie in resultados.values()),
+        "prediccion_s": sum(serie["tiempo_prediccion"] for serie in resultados.values()),
+        "modelos_elegidos": modelos,
+    })
+
+    # Publicación de la corrida
+    with cronometro(resultado, "publicacion_s"):
+        crear_tablas_publicacion(cursor, TABLA_PREDICCIONES, TABLA_CORRIDAS, TABLA_VIGENTE, VISTA_VIGENTE)
+        conexion.commit()
+        publicar_predicciones(cursor, df_futuro, TABLA_PREDICCIONES, TABLA_CORRIDAS, TABLA_VIGENTE, "por_serie")
+        conexion.commit()
+
+    cursor.close()
+    conexion.close()
+    print(f"Predicción: {resultado['series']} series en {resultado['entrenamiento_prediccion_s']:.2f} s "
+          f"({resultado['entrenamiento_prediccion_cache_s']:.2f} s con la caché de modelos)")
+    return resultado
+
+
+# --- dashboard ---
+
+# Cada aplicación tiene su propio app.py: el del dashboard se importa desde su ruta con otro nombre
+def cargar_dashboard():
+    spec = importlib.util.spec_from_file_location("dashboard", os.path.join(RAIZ, "frontend", "dash", "app.py"))
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = modulo
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def medir_dashboard(parametros, entidad, archivo_dir, args):
+    dashboard = cargar_dashboard()
+    dashboard.ENTITY_ID = entidad
+    dashboard.ARCHIVO_DIR = archivo_dir
+    # La ventana en memoria se cuenta desde hoy: se amplía hasta el inicio de los datos sintéticos
+    dashboard.VENTANA_MEMORIA_DIAS = (pd.Timestamp.today().normalize() - pd.Timestamp(INICIO)).days + 1
+    dashboard.MAX_PUNTOS_TRAZA = args.max_puntos
+
+    resultado = {}
+    with cronometro(resultado, "carga_inicial_s"):
+        if isinstance(parametros, str):
+            dashboard.iniciar(dsn=parametros)
+        else:
+            dashboard.iniciar(**parametros)
+    try:
+        _, serie = dashboard.datos.obtener("horario")
+        resultado["horas"] = len(serie)
+
+        rng = np.random.default_rng(args.semilla)
+        dias = pd.DatetimeIndex(serie.horas).normalize().unique()
+        fechas = [pd.Timestamp(dia) for dia in rng.choice(dias, args.repeticiones)]
+
+        tiempos = []
+        for fecha in fechas:
+            inicio = time.perf_counter()
+            dashboard.datos_fecha(fecha)
+            tiempos.append(time.perf_counter() - inicio)
+        resultado["datos_fecha"] = percentiles_ms(tiempos)
+
+        # El callback actualizar_visualizacion completo, sin caché de figuras (se vacía antes de cada llamada) y
+        # con la figura ya guardada
+        vistas = {}
+        for vista in dashboard.VISTAS:
+            sin_cache, con_cache = [], []
+            tamano = 0
+            for fecha in fechas[:max(1, args.repeticiones // 4)]:
+                fecha_iso = fecha.date().isoformat()
+                dashboard.cache_figuras.invalidar(lambda clave: True)
+                inicio = time.perf_counter()
+                _, figura_temperatura, figura_humedad, _ = dashboard.actualizar_visualizacion(fecha_iso, vista)
+                sin_cache.append(time.perf_counter() - inicio)
+                inicio = time.perf_counter()
+                dashboard.actualizar_visualizacion(fecha_iso, vista)
+                con_cache.append(time.perf_counter() - inicio)
+                tamano = len(json.dumps([figura_temperatura, figura_humedad]))
+            vistas[vista] = dict(percentiles_ms(sin_cache), cache=percentiles_ms(con_cache), payload_bytes=tamano)
+        resultado["actualizar_visualizacion"] = vistas
+    finally:
+        dashboard.datos.detener()
+        dashboard.pool.cerrar()
+
+    print(f"Dashboard: datos_fecha p50 {resultado['datos_fecha']['p50_ms']:.2f} ms, "
+          f"actualizar_visualizacion (dia) p50 {resultado['actualizar_visualizacion']['dia']['p50_ms']:.2f} ms")
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de punta a punta con datos sintéticos")
+    parser.add_argument("--sensores", type=int, default=4)
+    parser.add_argument("--dias", type=float, default=30)
+    parser.add_argument("--intervalo", type=int, default=60, help="Segundos entre lecturas de cada sensor")
+    parser.add_argument("--tasa-huecos", type=float, default=0.02)
+    parser.add_argument("--semilla", type=int, default=123)
+    parser.add_argument("--dsn", help="PostgreSQL existente (se usa una base vacía); por defecto se crea uno temporal")
+    parser.add_argument("--puerto-pg", type=int, default=54329)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--tam-pagina", type=int, default=5000)
+    parser.add_argument("--modo-carga", default="copy")
+    parser.add_argument("--max-lags", type=int, default=24)
+    parser.add_argument("--historia-dias", type=int, default=90)
+    parser.add_argument("--candidatos", nargs="+", help="Modelos de model_registry (por defecto todos)")
+    parser.add_argument("--presupuesto", type=float, help="Segundos de la corrida para evaluar candidatos")
+    parser.add_argument("--presupuesto-cpu", type=int, help="Núcleos para entrenar (por defecto todos)")
+    parser.add_argument("--max-procesos", type=int, help="Series entrenadas a la vez (por defecto todas)")
+    parser.add_argument("--max-puntos", type=int, default=1000)
+    parser.add_argument("--repeticiones", type=int, default=100)
+    parser.add_argument("--salida", default="benchmark.json")
+    args = parser.parse_args()
+
+    lecturas = generar_lecturas(args.sensores, args.dias, args.intervalo, args.tasa_huecos, semilla=args.semilla)
+    print(f"Datos sintéticos: {args.sensores} sensores, {total_lecturas(lecturas)} lecturas")
+    stub = CrateStub(lecturas).iniciar()
+
+    contexto = nullcontext(args.dsn) if args.dsn else postgres_temporal(args.puerto_pg)
+    archivo_dir = tempfile.mkdtemp(prefix="bench_archivo_")
+    try:
+        with contexto as parametros:
+            def conectar():
+                return psycopg2.connect(parametros) if isinstance(parametros, str) else psycopg2.connect(**parametros)
+
+            conexion = conectar()
+            crear_esquema_base(conexion)
+            conexion.close()
+
+            reporte = {
+                "parametros": {clave: valor for clave, valor in vars(args).items() if clave not in ("dsn", "salida")},
+                "entorno": {
+                    "commit": commit_actual(),
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "pandas": pd.__version__,
+                    "sklearn": sklearn.__version__,
+                    "cpus": os.cpu_count(),
+                },
+                "datos": {"lecturas": total_lecturas(lecturas), "consultas_crate": None},
+                "databaseloadjob": medir_carga(conectar, stub.url, archivo_dir, args),
+                "predictionjob": medir_prediccion(conectar, archivo_dir, args),
+                "dashboard": medir_dashboard(parametros, sorted(lecturas)[0], archivo_dir, args),
+            }
+            reporte["datos"]["consultas_crate"] = stub.consultas
+    finally:
+        stub.detener()
+        shutil.rmtree(archivo_dir, ignore_errors=True)
+
+    with open(args.salida, "w") as archivo:
+        json.dump(reporte, archivo, indent=2, sort_keys=True)
+    print(f"Reporte guardado en {args.salida}")
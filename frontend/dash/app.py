@@ -1,12 +1,27 @@
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, State, Patch
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 import plotly.graph_objs as go
 import pandas as pd
 import datetime
 import numpy as np
-import psycopg2
+import os
 import sys
+import json
+from flask import Response, jsonify
+from plotly.utils import PlotlyJSONEncoder
+
+# Módulos compartidos entre aplicaciones (shared/); en las imágenes de Docker se copian junto a la aplicación
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "shared"))
+
+from archive import leer_archivo
+from data_layer import CapaDatos
+from db_pool import PoolPostgres
+from downsampling import reducir
+from figure_cache import CacheFiguras
+from instrumentation import configurar, contar, tramo
+from time_store import SerieHoraria
 
 # Inicializar la aplicación con un tema de Bootstrap
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
@@ -18,264 +33,418 @@ POSTGRES_PORT = "5432"
 POSTGRES_DB = "postgres"
 POSTGRES_USER = "root"
 POSTGRES_PASSWORD = "password"
-POSTGRES_TABLE_TEMPERATURE = "temperature_dummy"
-POSTGRES_TABLE_HUMIDITY = "humidity_dummy"
-POSTGRES_TABLE_PREDICTION = "predictions"
-
-
-# Consulta a PostgreSQL
-try:
-    
-    # Conexión a PostgreSQL
-    print("Conectando a PostgreSQL...")
-    postgres_conn = psycopg2.connect(
-        host=POSTGRES_HOST,
-        port=POSTGRES_PORT,
-        database=POSTGRES_DB,
-        user=POSTGRES_USER,
-        password=POSTGRES_PASSWORD
-    )
-
-    cursor_pg = postgres_conn.cursor()
-
-    # Datos de temperatura y humedad
-    query_humidity = f"SELECT date_trunc('hour', timestamp) AS hour_interval, AVG(value) AS avg_value FROM {POSTGRES_TABLE_HUMIDITY} GROUP BY hour_interval ORDER BY hour_interval;"
-
-    query_temperature = f"SELECT date_trunc('hour', timestamp) AS hour_interval, AVG(value) AS avg_value FROM {POSTGRES_TABLE_TEMPERATURE} GROUP BY hour_interval ORDER BY hour_interval;"
-
-    query_prediction = f"SELECT date_trunc('hour', timestamp) AS hour_interval, temperature, humidity FROM {POSTGRES_TABLE_PREDICTION} ORDER BY hour_interval;"
-
-    query_last_temperature = f"SELECT date_trunc('hour', timestamp) AS hour_interval, value FROM {POSTGRES_TABLE_TEMPERATURE} ORDER BY hour_interval DESC LIMIT 1;"
+# Lecturas crudas: temperatura y humedad en la misma fila (la mantiene databaseloadjob)
+POSTGRES_TABLE_READINGS = "readings"
+# Resumen por hora que mantiene databaseloadjob
+POSTGRES_TABLE_HOURLY = "hourly_readings"
+ENTITY_ID = "Joselito"
+# Vista con las predicciones de la corrida vigente (la publica predictionjob)
+POSTGRES_VIEW_PREDICTION = "current_predictions"
+
+
+# Segundos que cada conjunto de datos se sirve desde memoria antes de que el hilo de fondo lo recargue
+TTL_HORARIO = 300
+TTL_PREDICCION = 600
+TTL_ULTIMAS_MEDIDAS = 30
+
+# Vistas de la pestaña de visualización: días que abarcan hasta la fecha seleccionada (incluida)
+VISTAS = {"dia": 1, "semana": 7, "mes": 30, "anio": 365}
+# Las vistas de más de un día se reducen en el servidor a lo sumo a MAX_PUNTOS_TRAZA puntos por serie
+# con "lttb" (conserva la forma) o "minmax" (conserva el mínimo y el máximo de cada tramo)
+MAX_PUNTOS_TRAZA = 1000
+METODO_REDUCCION = "lttb"
+
+# Modo en vivo: cada INTERVALO_VIVO_MS el navegador pide solo las lecturas posteriores a la última que
+# recibió; el gráfico en vivo conserva a lo sumo MAX_PUNTOS_VIVO puntos por serie
+INTERVALO_VIVO_MS = 5000
+MAX_PUNTOS_VIVO = 500
+
+# Memoria máxima de la caché de figuras serializadas (LRU)
+MAX_BYTES_CACHE_FIGURAS = 64 * 1024 * 1024
+
+
+# Archivo en Parquet de los días cerrados del resumen horario, que escribe databaseloadjob (None = leer todo de
+# PostgreSQL)
+ARCHIVO_DIR = "/data/archivo/hourly"
+
+# Días del resumen horario que se mantienen en memoria (alcanza para la vista de un año); los rangos anteriores
+# se piden a PostgreSQL solo para esa ventana
+VENTANA_MEMORIA_DIAS = 400
+
+# Pool de conexiones compartido por los callbacks y el hilo de recarga; se registran las consultas que tardan
+# más de LATENCIA_LENTA_S segundos y cada vez que todas las conexiones están en uso
+POOL_MIN_CONEXIONES = 4
+POOL_MAX_CONEXIONES = 4
+LATENCIA_LENTA_S = 0.5
+
+# Consultas preparadas: parámetros $1, $2, ... con sus tipos
+QUERY_HORARIO_RANGO = f"SELECT hour, temp_avg, hum_avg FROM {POSTGRES_TABLE_HOURLY} WHERE entity_id = $1 AND hour >= $2 AND hour < $3 ORDER BY hour"
+QUERY_PREDICCION = f"SELECT date_trunc('hour', timestamp) AS hour_interval, temperature, humidity FROM {POSTGRES_VIEW_PREDICTION} WHERE entity_id = $1 ORDER BY hour_interval"
+# Última temperatura y última humedad registradas (cada una puede venir de una lectura distinta si la otra
+# variable quedó vacía), en una sola consulta; ambas recorren hacia atrás el índice único (entity_id, timestamp)
+QUERY_ULTIMAS_MEDIDAS = f"""
+    SELECT t.hour_interval, t.temperature, h.hour_interval, h.humidity
+    FROM (SELECT date_trunc('hour', timestamp) AS hour_interval, temperature FROM {POSTGRES_TABLE_READINGS}
+          WHERE entity_id = $1 AND temperature IS NOT NULL ORDER BY timestamp DESC LIMIT 1) t
+    CROSS JOIN
+         (SELECT date_trunc('hour', timestamp) AS hour_interval, humidity FROM {POSTGRES_TABLE_READINGS}
+          WHERE entity_id = $1 AND humidity IS NOT NULL ORDER BY timestamp DESC LIMIT 1) h
+"""
+# Lecturas crudas posteriores a $2 (todas las recientes si es NULL), a lo sumo las últimas $3.
+# Usa el índice único (entity_id, timestamp)
+QUERY_LECTURAS_NUEVAS = f"""
+    SELECT timestamp, temperature, humidity
+    FROM {POSTGRES_TABLE_READINGS}
+    WHERE entity_id = $1 AND ($2 IS NULL OR timestamp > $2)
+    ORDER BY timestamp DESC
+    LIMIT $3
+"""
+
+
+# Resumen horario de [inicio, fin): los días archivados se leen del Parquet (solo las columnas usadas, con
+# memory-mapping) y a la base se le pide solo lo posterior al último día archivado
+def consultar_horario(inicio, fin):
+    partes = []
+    if ARCHIVO_DIR:
+        with tramo("archive_read"):
+            tabla, archivado_hasta = leer_archivo(ARCHIVO_DIR, [ENTITY_ID], inicio, fin, ["hour", "temp_avg", "hum_avg"])
+            partes.append(tabla.to_pandas().rename(columns={"temp_avg": "Temperatura", "hum_avg": "Humedad"})[["hour", "Temperatura", "Humedad"]])
+        contar("archive_read", filas=tabla.num_rows, bytes_=tabla.nbytes)
+        if ENTITY_ID in archivado_hasta:
+            inicio = max(inicio, datetime.datetime.combine(archivado_hasta[ENTITY_ID], datetime.time()))
+    if inicio < fin:
+        filas = pool.consultar("horario_rango", QUERY_HORARIO_RANGO, ["text", "timestamp", "timestamp"], (ENTITY_ID, inicio, fin))
+        partes.append(pd.DataFrame(filas, columns=["hour", "Temperatura", "Humedad"]))
+    df_horario = pd.concat(partes, ignore_index=True)
+    return SerieHoraria.desde_dataframe(df_horario, ["Temperatura", "Humedad"])
+
+
+# Datos de temperatura y humedad: una fila por hora ya agregada, sin recorrer las lecturas crudas.
+# Se guardan indexados por hora para ubicar cada día con búsqueda binaria, junto con el inicio de la ventana
+def cargar_horario():
+    desde = pd.Timestamp.today().normalize() - pd.Timedelta(days=VENTANA_MEMORIA_DIAS)
+    return desde, consultar_horario(desde.to_pydatetime(), datetime.datetime.max)
+
+
+def cargar_prediccion():
+    filas = pool.consultar("prediccion", QUERY_PREDICCION, ["text"], (ENTITY_ID,))
+    return pd.DataFrame(filas, columns=["Hora", "Temperatura", "Humedad"])
+
+
+def cargar_ultimas_medidas():
+    filas = pool.consultar("ultimas_medidas", QUERY_ULTIMAS_MEDIDAS, ["text"], (ENTITY_ID,))
+    last_temperature = [(hora_temperatura, temperatura) for hora_temperatura, temperatura, _, _ in filas]
+    last_humidity = [(hora_humedad, humedad) for _, _, hora_humedad, humedad in filas]
+    return last_temperature, last_humidity
+
+
+def lecturas_nuevas(desde, limite):
+    filas = pool.consultar("lecturas_nuevas", QUERY_LECTURAS_NUEVAS, ["text", "timestamp", "integer"], (ENTITY_ID, desde, limite))
+    return filas[::-1]
+
+
+metricas = configurar("dashboard")
+
+datos = CapaDatos({
+    "horario": (cargar_horario, TTL_HORARIO),
+    "prediccion": (cargar_prediccion, TTL_PREDICCION),
+    "ultimas_medidas": (cargar_ultimas_medidas, TTL_ULTIMAS_MEDIDAS),
+}, huellas={
+    # La versión solo avanza cuando la recarga trae datos distintos, no en cada TTL
+    "horario": lambda valor: (valor[0], valor[1].huella()),
+    "ultimas_medidas": lambda valor: valor,
+})
+
+# Se crea en iniciar(), al arrancar el servidor (o el benchmark)
+pool = None
+
+
+# Abre el pool con los parámetros de conexión de psycopg2, hace la carga inicial de todos los conjuntos y deja al
+# hilo de fondo manteniéndolos al día
+def iniciar(**parametros_postgres):
+    global pool
+    with tramo("connect", destino="postgres"):
+        pool = PoolPostgres(
+            POOL_MIN_CONEXIONES, POOL_MAX_CONEXIONES, latencia_lenta=LATENCIA_LENTA_S, **parametros_postgres
+        )
+    datos.refrescar_todo()
+    datos.iniciar()
+    # Dash arma el layout al asignarlo (para validar los callbacks), así que se asigna con los datos ya cargados
+    app.layout = construir_layout
+
+
+cache_figuras = CacheFiguras(MAX_BYTES_CACHE_FIGURAS)
+
+
+# Contadores de la caché (aciertos, fallos y duración de las recargas) por conjunto de datos, de la caché de figuras
+# y del pool de conexiones (saturación y latencia por consulta)
+@app.server.route("/cache-stats")
+def estadisticas_cache():
+    return jsonify({"datos": datos.estadisticas(), "figuras": cache_figuras.estadisticas(), "postgres": pool.estadisticas()})
+
+
+# Duración de las etapas (consultas, relleno de huecos, reducción y render de callbacks) para Prometheus
+@app.server.route("/metrics")
+def exponer_metricas():
+    return Response(metricas.exposicion(), mimetype="text/plain; version=0.0.4")
+
+
+# Serie horaria que cubre [inicio, fin]: la de memoria si el rango cae dentro de su ventana; si no, se consulta
+# a PostgreSQL solo ese rango
+def serie_horaria(inicio, fin):
+    desde, serie = datos.obtener("horario")
+    if pd.Timestamp(inicio) >= desde:
+        return serie
+    return consultar_horario(pd.Timestamp(inicio).to_pydatetime(), (pd.Timestamp(fin) + pd.Timedelta(hours=1)).to_pydatetime())
 
-    query_last_humidity = f"SELECT date_trunc('hour', timestamp) AS hour_interval, value FROM {POSTGRES_TABLE_HUMIDITY} ORDER BY hour_interval DESC LIMIT 1;"
 
-    cursor_pg.execute(query_humidity)
-    humedad = cursor_pg.fetchall()
-
-    cursor_pg.execute(query_temperature)
-    temperatura = cursor_pg.fetchall()
+# Seleccionar datos por fecha de calendario
+def datos_fecha(fecha):
 
-    cursor_pg.execute(query_prediction)
-    prediction = cursor_pg.fetchall()
-    # Separar las tuplas en tres listas: horas, temperaturas y humedades
-    horas_prediccion = [prediccion[0] for prediccion in prediction]
-    temperaturas_prediccion = [prediccion[1] for prediccion in prediction]
-    humedades_prediccion = [prediccion[2] for prediccion in prediction]
+    inicio = pd.Timestamp(fecha).normalize()
+    serie = serie_horaria(inicio, inicio + pd.Timedelta(hours=23))
+    # Alinear temperatura y humedad a las 24 horas del día e interpolar valores nulos
+    with tramo("gap_fill"):
+        horas, valores = serie.dia(fecha, politica="linear")
 
-    cursor_pg.execute(query_last_temperature)
-    last_temperature = cursor_pg.fetchall()
+    return pd.DataFrame({'Hora': horas, 'Temperatura': valores[:, 0], 'Humedad': valores[:, 1]})
 
-    cursor_pg.execute(query_last_humidity)
-    last_humidity = cursor_pg.fetchall()
 
-    # Cerrar el cursor y la conexión
-    cursor_pg.close()
-    postgres_conn.close()
+# Seleccionar los últimos `dias` días hasta la fecha, con cada serie reducida a MAX_PUNTOS_TRAZA puntos.
+# Devuelve columna -> (horas, valores) y la cantidad de horas del rango antes de reducir
+def datos_rango(fecha, dias):
+    fin = pd.Timestamp(fecha).normalize() + pd.Timedelta(hours=23)
+    inicio = fin.normalize() - pd.Timedelta(days=dias - 1)
+    serie = serie_horaria(inicio, fin)
+    horas, valores = serie.rango(inicio, fin)
+    with tramo("downsample", metodo=METODO_REDUCCION):
+        series = {
+            columna: reducir(horas, valores[:, j], MAX_PUNTOS_TRAZA, METODO_REDUCCION)
+            for j, columna in enumerate(serie.columnas)
+        }
+    return series, len(horas)
 
-except Exception as e:
-    print(f"Ha ocurrido un error: {e}")
-    sys.exit(1)
 
-finally:
-    # Cerrar cursores y conexiones
-    if cursor_pg:
-        cursor_pg.close()
-    if postgres_conn:
-        postgres_conn.close()
-    print("Conexiones cerradas.")
+# Crear figura de predicción de temperatura
+def figura_prediccion_temperatura(prediccion):
+    figura_serie_tiempo_temperatura_prediccion = go.Figure()
+    figura_serie_tiempo_temperatura_prediccion.add_trace(go.Scatter(
+        x=prediccion['Hora'],
+        y=prediccion['Temperatura'],
+        mode='lines',
+        name='Predicción Temperatura (°C)'
+    ))
+    figura_serie_tiempo_temperatura_prediccion.update_layout(
+        title="Predicción - temperatura para mañana",
+        xaxis_title="Hora",
+        yaxis_title="Temperatura (°C)",
+        template="plotly_white"
+    )
+    return figura_serie_tiempo_temperatura_prediccion
 
-# Seleccionar datos por fecha de calendario
-def datos_fecha(fecha):
 
-    # Convertirmo a objeto fecha
-    fecha_obj = pd.to_datetime(fecha).date()
+# Crear figura de predicción de humedad
+def figura_prediccion_humedad(prediccion):
+    figura_serie_tiempo_humedad_prediccion = go.Figure()
+    figura_serie_tiempo_humedad_prediccion.add_trace(go.Scatter(
+        x=prediccion['Hora'],
+        y=prediccion['Humedad'],
+        mode='lines',
+        name='Predicción Humedad (%)'
+    ))
+    figura_serie_tiempo_humedad_prediccion.update_layout(
+        title="Predicción - humedad para mañana",
+        xaxis_title="Hora",
+        yaxis_title="Humedad (%)",
+        template="plotly_white"
+    )
+    return figura_serie_tiempo_humedad_prediccion
 
-    horas = pd.date_range(start=fecha, periods=24, freq='h')
 
-    # Filtrar datos de temperatura y humedad por la fecha seleccionada y convertir a Series (para que quede indexado por hora)
-    temperatura_series = pd.Series(
-        {temp[0]: temp[1] for temp in temperatura if temp[0].date() == fecha_obj}, 
-        index=horas
-    )
-    humedad_series = pd.Series(
-        {hum[0]: hum[1] for hum in humedad if hum[0].date() == fecha_obj}, 
-        index=horas
-    )
+# Definir color del indicador de temperatura basado en el valor
+def color_indicador_temperatura(temperatura):
+    if temperatura < 15:
+        return "blue"  # Temperatura baja
+    elif 15 <= temperatura < 25:
+        return "green"  # Temperatura óptima
+    elif 25 <= temperatura < 35:
+        return "yellow"  # Temperatura alta
+    else:
+        return "red"  # Temperatura muy alta
 
-    # Interpolar valores nulos
-    temperatura_dia = temperatura_series.interpolate(method='linear').to_list()
-    humedad_dia = humedad_series.interpolate(method='linear').to_list()
 
+# Definir color del indicador de humedad basado en el valor
+def color_indicador_humedad(humedad):
+    if humedad < 30:
+        return "lightblue"  # Humedad muy baja
+    elif 30 <= humedad < 60:
+        return "green"  # Humedad óptima
+    elif 60 <= humedad < 80:
+        return "yellow"  # Humedad alta
+    else:
+        return "red"  # Humedad muy alta
 
-    return pd.DataFrame({'Hora': horas, 'Temperatura': temperatura_dia, 'Humedad': humedad_dia})
 
+def texto_ultimas_medidas(hora_temperatura, hora_humedad):
+    return "Últimas medidas registras para temperatura: " + hora_temperatura.strftime("%Y-%m-%d %H") + " horas y humedad: " + hora_humedad.strftime("%Y-%m-%d %H") + " horas"
 
-dato_prediccion = datos_fecha(datetime.date.today())
 
-# Crear figura de predicción de temperatura
-figura_serie_tiempo_temperatura_prediccion = go.Figure()
-figura_serie_tiempo_temperatura_prediccion.add_trace(go.Scatter(
-    x=horas_prediccion,
-    y=temperaturas_prediccion,
-    mode='lines',
-    name='Predicción Temperatura (°C)'
-))
-figura_serie_tiempo_temperatura_prediccion.update_layout(
-    title="Predicción - temperatura para mañana",
-    xaxis_title="Hora",
-    yaxis_title="Temperatura (°C)",
-    template="plotly_white"
-)
+# Gráfico del modo en vivo: vacío al cargar la página, se extiende con extendData
+def figura_vivo():
+    figura = go.Figure()
+    figura.add_trace(go.Scatter(x=[], y=[], mode='lines', name='Temperatura (°C)'))
+    figura.add_trace(go.Scatter(x=[], y=[], mode='lines', name='Humedad (%)', yaxis='y2'))
+    figura.update_layout(title="En vivo",
+                         xaxis_title="Hora",
+                         yaxis_title="Temperatura (°C)",
+                         yaxis2={'title': "Humedad (%)", 'overlaying': 'y', 'side': 'right'},
+                         template="plotly_white")
+    return figura
 
-# Crear figura de predicción de humedad
-figura_serie_tiempo_humedad_prediccion = go.Figure()
-figura_serie_tiempo_humedad_prediccion.add_trace(go.Scatter(
-    x=horas_prediccion,
-    y=humedades_prediccion,
-    mode='lines',
-    name='Predicción Humedad (%)'
-))
-figura_serie_tiempo_humedad_prediccion.update_layout(
-    title="Predicción - humedad para mañana",
-    xaxis_title="Hora",
-    yaxis_title="Humedad (%)",
-    template="plotly_white"
-)
 
-# Layout de la aplicación
-tabs = dbc.Tabs([
-    # Pestaña 1: Información de la planta
-    dbc.Tab(label='Información de la Planta', children=[
-    dbc.Container([
-        html.H1("Información de la Planta", className="text-center mt-4"),  # Centrado del título
-        dbc.Row([
-            dbc.Col(
-                dbc.Card([
-                    dbc.CardBody([
-                        html.H2("Suculenta Echeverias", className="card-text text-center"),
-                        html.P("Las suculentas son un tipo de planta muy popular debido a su resistencia y belleza.", className="text-center"),
-                        html.Br(),
-                        html.Img(src="/assets/plant.jpeg", className="img-fluid mx-auto d-block", style={"max-width": "50%"})
-                    ])
-                ], className="mx-auto"),  # Esto centra la tarjeta
-                width="6"  # Hace que la columna se ajuste a la tarjeta y ayuda a centrarla
-            ),
-            dbc.Col(
-                dbc.Card([
-                    dbc.CardBody([
-                        html.P([html.Strong("Origen: "),"Las suculentas provienen de áreas áridas y semiáridas de todo el mundo, especialmente de África, América y algunas partes de Asia. Su capacidad para almacenar agua en hojas, tallos o raíces les permite sobrevivir en condiciones de sequía extrema."], className="text-justify"),
-                        html.Br(),
-                        html.H2("Cuidados", className="card-text text-center"),
-                        html.Br(),
-                        html.P([html.Strong("Luz: "), "Las suculentas necesitan al menos 4 a 6 horas de luz indirecta o filtrada al día. Una ventana soleada es ideal para su crecimiento en interiores.La luz directa es buena, pero puede quemar sus hojas si es muy intensa o si la planta no está acostumbrada.", html.Br(), html.Br(), html.Strong("Riego")," La regla general es regarlas solo cuando el sustrato esté completamente seco, lo cual suele ser cada dos o tres semanas, dependiendo de las condiciones ambientales. Regar directamente el sustrato y evitar que el agua se acumule en las hojas o el centro de la planta, ya que esto puede causar pudrición. El exceso de riego es la causa más común de muerte en suculentas, ya que sus raíces se pudren fácilmente en sustratos encharcados.",html.Br(), html.Br(), html.Strong("Suelo:"), " Usar un sustrato especial para suculentas o cactus que drene bien, evitando mezclas que retengan demasiada agua. Se puede añadir arena gruesa o perlita al sustrato para mejorar el drenaje.",
-                        html.Br(), html.Br(), html.Strong("Temperatura:")," Las suculentas prefieren temperaturas entre 15°C y 29°C durante el día, aunque pueden tolerar temperaturas más bajas durante la noche. Son sensibles al frío extremo, especialmente aquellas que no están adaptadas a climas fríos.",
-                        html.Br(),], className="text-justify"),
-                    ])
-                ], className="mx-auto"),  # Esto centra la tarjeta
-                width="6"  # Hace que la columna se ajuste a la tarjeta y ayuda a centrarla
-            ),
-        ], justify="center", className="mt-4"),  # Centra el contenido en la fila
-    ])
-]),
+# Layout de la aplicación: se arma en cada carga de la página con los datos vigentes de la caché
+def construir_layout():
+    last_temperature, last_humidity = datos.obtener("ultimas_medidas")
+    prediccion = datos.obtener("prediccion")
+    figura_serie_tiempo_temperatura_prediccion = figura_prediccion_temperatura(prediccion)
+    figura_serie_tiempo_humedad_prediccion = figura_prediccion_humedad(prediccion)
 
-    # Pestaña 2: Visualización de Temperatura y Humedad
-    dbc.Tab(label='Visualización de Datos', children=[
+    tabs = dbc.Tabs([
+        # Pestaña 1: Información de la planta
+        dbc.Tab(label='Información de la Planta', children=[
         dbc.Container([
-            html.H1("Visualización de Temperatura y Humedad", className="mt-4"),
-            html.Hr(),
-            html.H4("Últimas medidas registras para temperatura: " + last_temperature[0][0].strftime("%Y-%m-%d %H") + " horas y humedad: " + last_humidity[0][0].strftime("%Y-%m-%d %H") + " horas", className="mt-4"),
-            html.Div(id='output-gauges', className='mt-4'),
-            dcc.DatePickerSingle(
-                id='date-picker',
-                date=datetime.date.today(),
-                max_date_allowed=datetime.date.today(),
-                className='mt-3'
-            ),
-            dcc.Graph(id='time-series-graph-temperatura',className='mt-4'),
-            dcc.Graph(id='time-series-graph-humedad', className='mt-4')
+            html.H1("Información de la Planta", className="text-center mt-4"),  # Centrado del título
+            dbc.Row([
+                dbc.Col(
+                    dbc.Card([
+                        dbc.CardBody([
+                            html.H2("Suculenta Echeverias", className="card-text text-center"),
+                            html.P("Las suculentas son un tipo de planta muy popular debido a su resistencia y belleza.", className="text-center"),
+                            html.Br(),
+                            html.Img(src="/assets/plant.jpeg", className="img-fluid mx-auto d-block", style={"max-width": "50%"})
+                        ])
+                    ], className="mx-auto"),  # Esto centra la tarjeta
+                    width="6"  # Hace que la columna se ajuste a la tarjeta y ayuda a centrarla
+                ),
+                dbc.Col(
+                    dbc.Card([
+                        dbc.CardBody([
+                            html.P([html.Strong("Origen: "),"Las suculentas provienen de áreas áridas y semiáridas de todo el mundo, especialmente de África, América y algunas partes de Asia. Su capacidad para almacenar agua en hojas, tallos o raíces les permite sobrevivir en condiciones de sequía extrema."], className="text-justify"),
+                            html.Br(),
+                            html.H2("Cuidados", className="card-text text-center"),
+                            html.Br(),
+                            html.P([html.Strong("Luz: "), "Las suculentas necesitan al menos 4 a 6 horas de luz indirecta o filtrada al día. Una ventana soleada es ideal para su crecimiento en interiores.La luz directa es buena, pero puede quemar sus hojas si es muy intensa o si la planta no está acostumbrada.", html.Br(), html.Br(), html.Strong("Riego")," La regla general es regarlas solo cuando el sustrato esté completamente seco, lo cual suele ser cada dos o tres semanas, dependiendo de las condiciones ambientales. Regar directamente el sustrato y evitar que el agua se acumule en las hojas o el centro de la planta, ya que esto puede causar pudrición. El exceso de riego es la causa más común de muerte en suculentas, ya que sus raíces se pudren fácilmente en sustratos encharcados.",html.Br(), html.Br(), html.Strong("Suelo:"), " Usar un sustrato especial para suculentas o cactus que drene bien, evitando mezclas que retengan demasiada agua. Se puede añadir arena gruesa o perlita al sustrato para mejorar el drenaje.",
+                            html.Br(), html.Br(), html.Strong("Temperatura:")," Las suculentas prefieren temperaturas entre 15°C y 29°C durante el día, aunque pueden tolerar temperaturas más bajas durante la noche. Son sensibles al frío extremo, especialmente aquellas que no están adaptadas a climas fríos.",
+                            html.Br(),], className="text-justify"),
+                        ])
+                    ], className="mx-auto"),  # Esto centra la tarjeta
+                    width="6"  # Hace que la columna se ajuste a la tarjeta y ayuda a centrarla
+                ),
+            ], justify="center", className="mt-4"),  # Centra el contenido en la fila
         ])
     ]),
 
-    # Pestaña 3: Vacía por ahora
-    dbc.Tab(label='Predicciones futuras', children=[
-        dbc.Container([
-            html.H1("Predicciones para mañana", className="mt-4"),
-            html.Hr(),
-            dcc.Graph(id='time-series-graph-temperatura-prediction', figure=figura_serie_tiempo_temperatura_prediccion, className='mt-4',),
-            dcc.Graph(id='time-series-graph-humedad-prediction', figure=figura_serie_tiempo_humedad_prediccion ,className='mt-4')
+        # Pestaña 2: Visualización de Temperatura y Humedad
+        dbc.Tab(label='Visualización de Datos', children=[
+            dbc.Container([
+                html.H1("Visualización de Temperatura y Humedad", className="mt-4"),
+                html.Hr(),
+                html.H4(texto_ultimas_medidas(last_temperature[0][0], last_humidity[0][0]), id='ultimas-medidas', className="mt-4"),
+                dbc.Switch(id='modo-vivo', label="En vivo", value=False, className='mt-2'),
+                dcc.Interval(id='intervalo-vivo', interval=INTERVALO_VIVO_MS, disabled=True),
+                # Hora de la última lectura recibida por este navegador
+                dcc.Store(id='ultimo-timestamp'),
+                html.Div(id='output-gauges', className='mt-4'),
+                dcc.DatePickerSingle(
+                    id='date-picker',
+                    date=datetime.date.today(),
+                    max_date_allowed=datetime.date.today(),
+                    className='mt-3'
+                ),
+                dcc.RadioItems(
+                    id='vista',
+                    options=[
+                        {'label': ' Día', 'value': 'dia'},
+                        {'label': ' Semana', 'value': 'semana'},
+                        {'label': ' Mes', 'value': 'mes'},
+                        {'label': ' Año', 'value': 'anio'},
+                    ],
+                    value='dia',
+                    inline=True,
+                    inputStyle={'margin-left': '12px'},
+                    className='mt-3'
+                ),
+                html.Small(id='payload-info', className='text-muted'),
+                dcc.Graph(id='time-series-graph-temperatura',className='mt-4'),
+                dcc.Graph(id='time-series-graph-humedad', className='mt-4'),
+                dcc.Graph(id='grafico-vivo', figure=figura_vivo(), className='mt-4')
+            ])
+        ]),
+
+        # Pestaña 3: Vacía por ahora
+        dbc.Tab(label='Predicciones futuras', children=[
+            dbc.Container([
+                html.H1("Predicciones para mañana", className="mt-4"),
+                html.Hr(),
+                dcc.Graph(id='time-series-graph-temperatura-prediction', figure=figura_serie_tiempo_temperatura_prediccion, className='mt-4',),
+                dcc.Graph(id='time-series-graph-humedad-prediction', figure=figura_serie_tiempo_humedad_prediccion ,className='mt-4')
+            ])
         ])
     ])
-])
 
-# Layout principal
-app.layout = dbc.Container([
-    html.H1("Dashboard de Planta", className="text-center mt-4 mb-4"),
-    tabs
-], fluid=True)
+    # Layout principal
+    return dbc.Container([
+        html.H1("Dashboard de Planta", className="text-center mt-4 mb-4"),
+        tabs
+    ], fluid=True)
 
-# Callback para actualizar los gauges y las series de tiempo
-@app.callback(
-    [Output('output-gauges', 'children'),
-     Output('time-series-graph-temperatura', 'figure'),
-     Output('time-series-graph-humedad', 'figure')],
-    [Input('date-picker', 'date')]
-)
-def actualizar_visualizacion(fecha_seleccionada):
-    # Generar datos ficticios para la fecha seleccionada
-    datos = datos_fecha(fecha_seleccionada)
+
+# Gauges con las últimas medidas; se guardan en la caché por versión de las últimas medidas
+def construir_gauges():
+    last_temperature, last_humidity = datos.obtener("ultimas_medidas")
 
     ultima_temperatura = last_temperature[0][1]
     ultima_humedad = last_humidity[0][1]
 
-    # Definir color del indicador de temperatura basado en el valor
-    if ultima_temperatura < 15:
-        color_temperatura = "blue"  # Temperatura baja
-    elif 15 <= ultima_temperatura < 25:
-        color_temperatura = "green"  # Temperatura óptima
-    elif 25 <= ultima_temperatura < 35:
-        color_temperatura = "yellow"  # Temperatura alta
-    else:
-        color_temperatura = "red"  # Temperatura muy alta
-
-    # Definir color del indicador de humedad basado en el valor
-    if ultima_humedad < 30:
-        color_humedad = "lightblue"  # Humedad muy baja
-    elif 30 <= ultima_humedad < 60:
-        color_humedad = "green"  # Humedad óptima
-    elif 60 <= ultima_humedad < 80:
-        color_humedad = "yellow"  # Humedad alta
-    else:
-        color_humedad = "red"  # Humedad muy alta
-
+    color_temperatura = color_indicador_temperatura(ultima_temperatura)
+    color_humedad = color_indicador_humedad(ultima_humedad)
 
     # Crear gráficos de gauge para temperatura y humedad
-    gauge_temperatura = dcc.Graph(
-        figure=go.Figure(go.Indicator(
-            mode="gauge+number",
-            value=ultima_temperatura,
-            title={'text': "Temperatura (°C)"},
-            gauge={
-            'axis': {'range': [0, 50]},
-            'bar': {'color': color_temperatura}  # Color dinámico del indicador
-            }
-        )), style={'display': 'inline-block', 'width': '45%'}
-    )
-
-    gauge_humedad = dcc.Graph(
-        figure=go.Figure(go.Indicator(
-            mode="gauge+number",
-            value=ultima_humedad,
-            title={'text': "Humedad (%)"},
-            gauge={
-            'axis': {'range': [0, 100]},
-            'bar': {'color': color_humedad}  # Color dinámico del indicador
-            }
-        )), style={'display': 'inline-block', 'width': '45%'}
-    )
+    gauge_temperatura = go.Figure(go.Indicator(
+        mode="gauge+number",
+        value=ultima_temperatura,
+        title={'text': "Temperatura (°C)"},
+        gauge={
+        'axis': {'range': [0, 50]},
+        'bar': {'color': color_temperatura}  # Color dinámico del indicador
+        }
+    ))
+
+    gauge_humedad = go.Figure(go.Indicator(
+        mode="gauge+number",
+        value=ultima_humedad,
+        title={'text': "Humedad (%)"},
+        gauge={
+        'axis': {'range': [0, 100]},
+        'bar': {'color': color_humedad}  # Color dinámico del indicador
+        }
+    ))
+
+    return json.dumps([gauge_temperatura, gauge_humedad], cls=PlotlyJSONEncoder)
+
+
+# Series de tiempo de la fecha (o del rango que termina en ella) serializadas junto con el texto del tamaño
+def construir_series(fecha_seleccionada, vista):
+    if vista == "dia":
+        datos_dia = datos_fecha(fecha_seleccionada)
+        series = {columna: (datos_dia['Hora'], datos_dia[columna]) for columna in ["Temperatura", "Humedad"]}
+        horas_rango = len(datos_dia)
+    else:
+        series, horas_rango = datos_rango(fecha_seleccionada, VISTAS[vista])
 
     # Crear serie de tiempo para temperatura
     figura_serie_tiempo_temperatura = go.Figure()
-    figura_serie_tiempo_temperatura.add_trace(go.Scatter(x=datos['Hora'], y=datos['Temperatura'], mode='lines', name='Temperatura (°C)'))
+    figura_serie_tiempo_temperatura.add_trace(go.Scatter(x=series['Temperatura'][0], y=series['Temperatura'][1], mode='lines', name='Temperatura (°C)'))
     figura_serie_tiempo_temperatura.update_layout(title="Series de Tiempo - Temperatura",
                                       xaxis_title="Hora",
                                       yaxis_title="Valores",
@@ -283,14 +452,144 @@ def actualizar_visualizacion(fecha_seleccionada):
 
     # Crear serie de tiempo para humedad
     figura_serie_tiempo_humedad = go.Figure()
-    figura_serie_tiempo_humedad.add_trace(go.Scatter(x=datos['Hora'], y=datos['Humedad'], mode='lines', name='Humedad (%)'))
+    figura_serie_tiempo_humedad.add_trace(go.Scatter(x=series['Humedad'][0], y=series['Humedad'][1], mode='lines', name='Humedad (%)'))
     figura_serie_tiempo_humedad.update_layout(title="Series de Tiempo - Humedad",
                                       xaxis_title="Hora",
                                       yaxis_title="Valores",
                                       template="plotly_white")
 
-    return [gauge_temperatura, gauge_humedad], figura_serie_tiempo_temperatura, figura_serie_tiempo_humedad
+    # Tamaño de las figuras que se envían al navegador
+    figuras = json.dumps([figura_serie_tiempo_temperatura, figura_serie_tiempo_humedad], cls=PlotlyJSONEncoder)
+    puntos = max(len(horas) for horas, _ in series.values())
+    info = f"{puntos} puntos por serie de {horas_rango} horas en el rango, {len(figuras) / 1024:.1f} kB"
+    return '{"figuras": ' + figuras + ', "info": ' + json.dumps(info) + '}'
+
+
+# La clave lleva la huella de las horas que muestra la vista, también para los días pasados: la carga horaria y el
+# archivo completan días ya terminados (la última hora después de medianoche, las recuperaciones tras una caída),
+# así que se reconstruye solo la figura cuyo rango cambió. Un rango fuera de la ventana en memoria se consulta a
+# PostgreSQL y se identifica por la versión del resumen horario
+def series_en_cache(fecha_seleccionada, vista):
+    fecha = pd.Timestamp(fecha_seleccionada).normalize()
+    inicio = fecha - pd.Timedelta(days=VISTAS[vista] - 1)
+    desde, serie = datos.obtener("horario")
+    contenido = serie.huella(inicio, fecha + pd.Timedelta(hours=23)) if inicio >= desde else datos.version("horario")
+    clave = ("series", fecha.date().isoformat(), vista, contenido)
+    valor = cache_figuras.obtener(clave)
+    if valor is None:
+        cache_figuras.invalidar(lambda otra: otra[:3] == clave[:3])
+        valor = construir_series(fecha_seleccionada, vista)
+        cache_figuras.guardar(clave, valor)
+    return valor
+
+
+def gauges_en_cache():
+    clave = ("gauges", datos.version("ultimas_medidas"))
+    valor = cache_figuras.obtener(clave)
+    if valor is None:
+        cache_figuras.invalidar(lambda otra: otra[0] == "gauges")
+        valor = construir_gauges()
+        cache_figuras.guardar(clave, valor)
+    return valor
+
+
+# Callback para actualizar los gauges y las series de tiempo
+@app.callback(
+    [Output('output-gauges', 'children'),
+     Output('time-series-graph-temperatura', 'figure'),
+     Output('time-series-graph-humedad', 'figure'),
+     Output('payload-info', 'children')],
+    [Input('date-picker', 'date'),
+     Input('vista', 'value')]
+)
+def actualizar_visualizacion(fecha_seleccionada, vista):
+    # La vista llega del navegador: como etiqueta de las métricas solo se usan las conocidas
+    etiqueta_vista = vista if vista in VISTAS else "otra"
+    with tramo("callback_render", callback="visualizacion", vista=etiqueta_vista):
+        # Figuras ya serializadas: de la caché o construidas con los datos en memoria
+        series_json = series_en_cache(fecha_seleccionada, vista)
+        gauges_json = gauges_en_cache()
+        series = json.loads(series_json)
+        gauge_temperatura, gauge_humedad = json.loads(gauges_json)
+    contar("callback_render", bytes_=len(series_json) + len(gauges_json), callback="visualizacion", vista=etiqueta_vista)
+    figura_serie_tiempo_temperatura, figura_serie_tiempo_humedad = series["figuras"]
+
+    gauges = [
+        dcc.Graph(figure=gauge_temperatura, style={'display': 'inline-block', 'width': '45%'}),
+        dcc.Graph(figure=gauge_humedad, style={'display': 'inline-block', 'width': '45%'}),
+    ]
+    return gauges, figura_serie_tiempo_temperatura, figura_serie_tiempo_humedad, series["info"]
+
+
+@app.callback(
+    Output('intervalo-vivo', 'disabled'),
+    Input('modo-vivo', 'value')
+)
+def activar_vivo(activo):
+    return not activo
+
+
+# Hora y valor de la última lectura no nula de una variable ((None, None) si todas son nulas)
+def ultimo_valor(horas, valores):
+    for hora, valor in zip(reversed(horas), reversed(valores)):
+        if valor is not None:
+            return hora, valor
+    return None, None
+
+
+# Modo en vivo: consulta solo las lecturas nuevas y modifica en el navegador el valor y el color de los gauges
+# (Patch) y agrega los puntos al gráfico en vivo (extendData), sin volver a enviar las figuras completas
+@app.callback(
+    [Output('output-gauges', 'children', allow_duplicate=True),
+     Output('ultimas-medidas', 'children'),
+     Output('grafico-vivo', 'extendData'),
+     Output('ultimo-timestamp', 'data')],
+    Input('intervalo-vivo', 'n_intervals'),
+    State('ultimo-timestamp', 'data'),
+    prevent_initial_call=True
+)
+def actualizar_vivo(_, ultimo_timestamp):
+    with tramo("callback_render", callback="vivo"):
+        filas = lecturas_nuevas(ultimo_timestamp, MAX_PUNTOS_VIVO)
+    contar("callback_render", filas=len(filas), callback="vivo")
+    if not filas:
+        raise PreventUpdate
+
+    horas = [fila[0] for fila in filas]
+    temperaturas = [fila[1] for fila in filas]
+    humedades = [fila[2] for fila in filas]
+
+    # Una lectura puede traer solo una de las variables: cada gauge toma el último valor no nulo de la suya y, si
+    # no llegó ninguno, queda como estaba
+    hora_temperatura, temperatura = ultimo_valor(horas, temperaturas)
+    hora_humedad, humedad = ultimo_valor(horas, humedades)
+    gauges = Patch()
+    if temperatura is not None:
+        gauges[0]['props']['figure']['data'][0]['value'] = temperatura
+        gauges[0]['props']['figure']['data'][0]['gauge']['bar']['color'] = color_indicador_temperatura(temperatura)
+    if humedad is not None:
+        gauges[1]['props']['figure']['data'][0]['value'] = humedad
+        gauges[1]['props']['figure']['data'][0]['gauge']['bar']['color'] = color_indicador_humedad(humedad)
+    texto = texto_ultimas_medidas(hora_temperatura, hora_humedad) if temperatura is not None and humedad is not None else dash.no_update
+
+    extension = ({'x': [horas, horas], 'y': [temperaturas, humedades]}, [0, 1], MAX_PUNTOS_VIVO)
+    return gauges, texto, extension, horas[-1].isoformat()
+
 
 # Ejecutar la aplicación
 if __name__ == '__main__':
+    # Carga inicial: si PostgreSQL no responde al arrancar, el dashboard no se levanta
+    try:
+        print("Conectando a PostgreSQL...")
+        iniciar(
+            host=POSTGRES_HOST,
+            port=POSTGRES_PORT,
+            database=POSTGRES_DB,
+            user=POSTGRES_USER,
+            password=POSTGRES_PASSWORD
+        )
+    except Exception as e:
+        print(f"Ha ocurrido un error: {e}")
+        sys.exit(1)
+
     app.run_server(debug=True, port=8050)
@@ -0,0 +1,86 @@
+"""Latencia de la consulta de un día (datos_fecha) según el largo de la historia horaria.
+
+Compara completar el día sobre todo el DataFrame horario (recorre la historia completa en cada llamada)
+con la búsqueda binaria en SerieHoraria.
+
+Ejemplo: python bench_datos_fecha.py --anios 1 5 10 --repeticiones 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Módulos compartidos entre aplicaciones (shared/); en las imágenes de Docker se copian junto a la aplicación
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "shared"))
+
+from resampling import completar_horas
+from time_store import SerieHoraria
+
+COLUMNAS = ["Temperatura", "Humedad"]
+
+
+# Historia horaria sintética con un 2 % de horas faltantes
+def generar_historia(anios, semilla=123):
+    rng = np.random.default_rng(semilla)
+    horas = pd.date_range(end=pd.Timestamp.today().normalize(), periods=anios * 365 * 24, freq="h")
+    t = np.arange(len(horas))
+    df = pd.DataFrame({
+        "hour": horas,
+        "Temperatura": 20 + 5 * np.sin(2 * np.pi * t / 24) + rng.normal(0, 0.5, len(t)),
+        "Humedad": 60 - 10 * np.sin(2 * np.pi * t / 24) + rng.normal(0, 1.5, len(t)),
+    })
+    return df[rng.random(len(df)) > 0.02].reset_index(drop=True)
+
+
+def dia_dataframe(df_horario, fecha):
+    horas = pd.date_range(start=fecha, periods=24, freq="h")
+    return completar_horas(df_horario, COLUMNAS, politica="linear", inicio=horas[0], fin=horas[-1])
+
+
+# Mediana y percentil 95 en milisegundos de consultar fechas al azar dentro de la historia
+def medir(consultar, fechas):
+    tiempos = []
+    for fecha in fechas:
+        inicio = time.perf_counter()
+        consultar(fecha)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return float(np.median(tiempos)), float(np.percentile(tiempos, 95))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de datos_fecha: DataFrame completo vs SerieHoraria")
+    parser.add_argument("--anios", type=int, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--json", help="Archivo donde guardar los resultados")
+    args = parser.parse_args()
+
+    resultados = []
+    print(f"{'años':>4} {'horas':>8} | {'DataFrame p50':>13} {'p95':>8} | {'SerieHoraria p50':>16} {'p95':>8} | {'construcción':>12}")
+    for anios in args.anios:
+        df_horario = generar_historia(anios)
+        inicio = time.perf_counter()
+        serie = SerieHoraria.desde_dataframe(df_horario, COLUMNAS)
+        construccion = time.perf_counter() - inicio
+
+        rng = np.random.default_rng(anios)
+        dias = df_horario["hour"].dt.normalize().unique()
+        fechas = [pd.Timestamp(dia) for dia in rng.choice(dias, args.repeticiones)]
+
+        p50_df, p95_df = medir(lambda fecha: dia_dataframe(df_horario, fecha), fechas)
+        p50_serie, p95_serie = medir(serie.dia, fechas)
+        resultados.append({
+            "anios": anios,
+            "horas": len(df_horario),
+            "dataframe_ms": {"p50": p50_df, "p95": p95_df},
+            "serie_horaria_ms": {"p50": p50_serie, "p95": p95_serie},
+            "construccion_s": construccion,
+        })
+        print(f"{anios:>4} {len(df_horario):>8} | {p50_df:>11.2f}ms {p95_df:>6.2f}ms | {p50_serie:>14.2f}ms {p95_serie:>6.2f}ms | {construccion:>11.3f}s")
+
+    if args.json:
+        with open(args.json, "w") as archivo:
+            json.dump(resultados, archivo, indent=2)
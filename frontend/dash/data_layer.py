@@ -0,0 +1,128 @@
+"""Capa de acceso a datos del dashboard con caché por conjunto de datos.
+
+Cada conjunto de datos tiene su función de carga y su TTL. Un hilo en segundo plano recarga los que
+vencieron y reemplaza la instantánea completa de una sola vez, así los callbacks leen siempre de memoria
+una versión entera (la nueva o la anterior) sin esperar a PostgreSQL. Solo la primera lectura de un
+conjunto que nunca se cargó consulta la base en el momento. La versión de un conjunto con huella solo avanza
+cuando la recarga trae datos distintos.
+"""
+import threading
+import time
+from collections import namedtuple
+
+# valor: resultado de la carga; cargado_en: time.monotonic() del fin de la carga; version: número de cambio
+# del contenido; huella: resumen del contenido (None si el conjunto no tiene función de huella)
+Instantanea = namedtuple("Instantanea", ["valor", "cargado_en", "version", "huella"])
+
+
+class CapaDatos:
+
+    # conjuntos: diccionario nombre -> (cargar(), ttl en segundos); cada carga consulta PostgreSQL por su cuenta.
+    # huellas: nombre -> función(valor) que resume el contenido; sin huella, cada recarga es una versión nueva
+    def __init__(self, conjuntos, intervalo=1.0, huellas=None):
+        self.conjuntos = conjuntos
+        self.huellas = huellas or {}
+        self.intervalo = intervalo
+        self._instantaneas = {}
+        # Tras un error la recarga se reintenta recién cuando vuelve a vencer el TTL
+        self._reintento = {}
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._contadores = {
+            nombre: {
+                "hits": 0, "misses": 0, "stale_hits": 0,
+                "refreshes": 0, "refresh_errors": 0,
+                "refresh_last_s": 0.0, "refresh_total_s": 0.0,
+            }
+            for nombre in conjuntos
+        }
+
+    def _contar(self, nombre, clave, valor=1):
+        with self._lock:
+            self._contadores[nombre][clave] += valor
+
+    # Ejecuta la carga de un conjunto y publica la nueva instantánea
+    def refrescar(self, nombre):
+        cargar, _ = self.conjuntos[nombre]
+        inicio = time.perf_counter()
+        try:
+            valor = cargar()
+        except Exception:
+            self._contar(nombre, "refresh_errors")
+            raise
+        duracion = time.perf_counter() - inicio
+
+        anterior = self._instantaneas.get(nombre)
+        huella = self.huellas[nombre](valor) if nombre in self.huellas else None
+        if anterior is None:
+            version = 1
+        elif huella is not None and huella == anterior.huella:
+            # Mismos datos: se conserva la versión para no invalidar lo que se armó con ella
+            version = anterior.version
+        else:
+            version = anterior.version + 1
+        # Reemplazo atómico: los lectores toman la instantánea anterior o la nueva, nunca una mezcla
+        self._instantaneas[nombre] = Instantanea(valor, time.monotonic(), version, huella)
+        with self._lock:
+            contadores = self._contadores[nombre]
+            contadores["refreshes"] += 1
+            contadores["refresh_last_s"] = duracion
+            contadores["refresh_total_s"] += duracion
+        return valor
+
+    def refrescar_todo(self):
+        for nombre in self.conjuntos:
+            self.refrescar(nombre)
+
+    def _vencida(self, nombre, instantanea):
+        _, ttl = self.conjuntos[nombre]
+        return time.monotonic() - instantanea.cargado_en >= ttl
+
+    # Devuelve el valor en memoria aunque esté vencido (lo renueva el hilo); si nunca se cargó, lo carga ahora
+    def obtener(self, nombre):
+        instantanea = self._instantaneas.get(nombre)
+        if instantanea is None:
+            self._contar(nombre, "misses")
+            return self.refrescar(nombre)
+        self._contar(nombre, "stale_hits" if self._vencida(nombre, instantanea) else "hits")
+        return instantanea.valor
+
+    # Versión de la instantánea vigente (0 si aún no se cargó)
+    def version(self, nombre):
+        instantanea = self._instantaneas.get(nombre)
+        return instantanea.version if instantanea else 0
+
+    def _ciclo(self):
+        while not self._detener.wait(self.intervalo):
+            for nombre in self.conjuntos:
+                instantanea = self._instantaneas.get(nombre)
+                if instantanea is not None and not self._vencida(nombre, instantanea):
+                    continue
+                if time.monotonic() < self._reintento.get(nombre, 0.0):
+                    continue
+                try:
+                    self.refrescar(nombre)
+                except Exception as e:
+                    # Se sigue sirviendo la instantánea anterior
+                    print(f"Error al refrescar {nombre}: {e}")
+                    self._reintento[nombre] = time.monotonic() + self.conjuntos[nombre][1]
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._ciclo, name="capa-datos", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join()
+
+    def estadisticas(self):
+        with self._lock:
+            estadisticas = {nombre: dict(contadores) for nombre, contadores in self._contadores.items()}
+        for nombre, contadores in estadisticas.items():
+            instantanea = self._instantaneas.get(nombre)
+            contadores["version"] = instantanea.version if instantanea else 0
+            contadores["age_s"] = time.monotonic() - instantanea.cargado_en if instantanea else None
+            contadores["ttl_s"] = self.conjuntos[nombre][1]
+        return estadisticas
@@ -0,0 +1,120 @@
+"""Pool de conexiones a PostgreSQL compartido por los callbacks y el hilo de recarga del dashboard.
+
+Las consultas se preparan una vez por conexión (PREPARE) y luego se ejecutan con EXECUTE y sus
+parámetros. Cuando todas las conexiones están en uso, quien pide una espera a que se libere (en lugar
+del PoolError de psycopg2) y se registra la saturación; las consultas lentas también se registran.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from psycopg2.pool import ThreadedConnectionPool
+
+from instrumentation import contar, registrar
+
+
+class PoolPostgres:
+
+    # psycopg2 cierra al devolverlas las conexiones que superan `minimo`: con minimo == maximo todas se
+    # conservan abiertas y con sus sentencias preparadas
+    def __init__(self, minimo, maximo, latencia_lenta=0.5, reporte_cada=500, **parametros):
+        self.maximo = maximo
+        self.latencia_lenta = latencia_lenta
+        self.reporte_cada = reporte_cada
+        self._pool = ThreadedConnectionPool(minimo, maximo, **parametros)
+        self._disponibles = threading.BoundedSemaphore(maximo)
+        self._lock = threading.Lock()
+        # Sentencias ya preparadas en cada conexión (por id de la conexión)
+        self._preparadas = {}
+        self.en_uso = 0
+        self.saturaciones = 0
+        self.espera_total_s = 0.0
+        self.consultas = {}
+
+    @contextmanager
+    def conexion(self):
+        inicio = time.perf_counter()
+        if not self._disponibles.acquire(blocking=False):
+            with self._lock:
+                self.saturaciones += 1
+            print(f"Pool de PostgreSQL saturado: {self.maximo} conexiones en uso, esperando")
+            self._disponibles.acquire()
+        espera = time.perf_counter() - inicio
+
+        conexion = None
+        descartar = False
+        try:
+            conexion = self._pool.getconn()
+            # Solo lecturas: sin transacciones abiertas entre consultas
+            if not conexion.autocommit:
+                conexion.autocommit = True
+            with self._lock:
+                self.en_uso += 1
+                self.espera_total_s += espera
+            yield conexion
+        except Exception:
+            descartar = conexion is not None and conexion.closed != 0
+            raise
+        finally:
+            if conexion is not None:
+                self._pool.putconn(conexion, close=descartar)
+                with self._lock:
+                    self.en_uso -= 1
+                    # psycopg2 cierra las conexiones devueltas que superan el mínimo del pool
+                    if conexion.closed:
+                        self._preparadas.pop(id(conexion), None)
+            self._disponibles.release()
+
+    # Ejecuta la sentencia preparada `nombre` (sql con parámetros $1, $2, ... de los tipos indicados)
+    # y devuelve todas las filas
+    def consultar(self, nombre, sql, tipos, parametros):
+        with self.conexion() as conexion:
+            with conexion.cursor() as cursor:
+                preparadas = self._preparadas.setdefault(id(conexion), set())
+                if nombre not in preparadas:
+                    cursor.execute(f"PREPARE {nombre} ({', '.join(tipos)}) AS {sql}")
+                    preparadas.add(nombre)
+
+                inicio = time.perf_counter()
+                cursor.execute(f"EXECUTE {nombre} ({', '.join(['%s'] * len(parametros))})", parametros)
+                filas = cursor.fetchall()
+                latencia = time.perf_counter() - inicio
+
+        self._registrar(nombre, latencia, len(filas))
+        return filas
+
+    def _registrar(self, nombre, latencia, n_filas):
+        registrar("query", latencia, consulta=nombre)
+        contar("query", filas=n_filas, consulta=nombre)
+        with self._lock:
+            estadistica = self.consultas.setdefault(nombre, {"count": 0, "total_s": 0.0, "max_s": 0.0, "rows": 0})
+            estadistica["count"] += 1
+            estadistica["total_s"] += latencia
+            estadistica["max_s"] = max(estadistica["max_s"], latencia)
+            estadistica["rows"] += n_filas
+            total = sum(e["count"] for e in self.consultas.values())
+        if latencia >= self.latencia_lenta:
+            print(f"Consulta lenta {nombre}: {latencia * 1000:.0f} ms, {n_filas} filas")
+        if total % self.reporte_cada == 0:
+            self.reportar()
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "max_connections": self.maximo,
+                "in_use": self.en_uso,
+                "saturations": self.saturaciones,
+                "wait_total_s": self.espera_total_s,
+                "queries": {nombre: dict(e) for nombre, e in self.consultas.items()},
+            }
+
+    def reportar(self):
+        e = self.estadisticas()
+        latencias = ", ".join(
+            f"{nombre} {c['total_s'] / c['count'] * 1000:.1f} ms" for nombre, c in e["queries"].items() if c["count"]
+        )
+        print(f"Pool de PostgreSQL: {e['in_use']}/{e['max_connections']} en uso, {e['saturations']} saturaciones, "
+              f"latencia media: {latencias}")
+
+    def cerrar(self):
+        self._pool.closeall()
@@ -0,0 +1,73 @@
+"""Reducción de puntos de una serie antes de enviarla al navegador.
+
+- "lttb" (Largest-Triangle-Three-Buckets): conserva la forma de la curva eligiendo en cada tramo el
+  punto que forma el triángulo de mayor área con el punto anterior y el promedio del tramo siguiente.
+- "minmax": en cada tramo conserva el mínimo y el máximo, así ningún pico queda fuera.
+
+En ambos casos se conservan el primer y el último punto y los puntos devueltos siguen ordenados.
+"""
+import numpy as np
+
+METODOS = ("lttb", "minmax")
+
+
+# x: arreglo numérico creciente (para fechas, int64 en nanosegundos); devuelve los índices a conservar
+def indices_lttb(x, y, n_puntos):
+    n = len(x)
+    if n_puntos >= n or n_puntos < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Tramos interiores (sin el primer y el último punto)
+    bordes = np.linspace(1, n - 1, n_puntos - 1).astype(np.int64)
+    indices = np.empty(n_puntos, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    anterior = 0
+    for k in range(n_puntos - 2):
+        inicio, fin = bordes[k], bordes[k + 1]
+        # Promedio del tramo siguiente (para el último tramo, el último punto)
+        if k + 2 < len(bordes):
+            x_siguiente = x[fin:bordes[k + 2]].mean()
+            y_siguiente = y[fin:bordes[k + 2]].mean()
+        else:
+            x_siguiente, y_siguiente = x[-1], y[-1]
+        areas = np.abs(
+            (x[anterior] - x_siguiente) * (y[inicio:fin] - y[anterior])
+            - (x[anterior] - x[inicio:fin]) * (y_siguiente - y[anterior])
+        )
+        anterior = inicio + int(np.argmax(areas))
+        indices[k + 1] = anterior
+    return indices
+
+
+def indices_minmax(x, y, n_puntos):
+    n = len(x)
+    if n_puntos >= n or n_puntos < 4:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=np.float64)
+    # Dos puntos por tramo; el primero y el último se agregan aparte
+    bordes = np.linspace(1, n - 1, (n_puntos - 2) // 2 + 1).astype(np.int64)
+    seleccion = [0, n - 1]
+    for inicio, fin in zip(bordes[:-1], bordes[1:]):
+        if fin > inicio:
+            seleccion.append(inicio + int(np.argmin(y[inicio:fin])))
+            seleccion.append(inicio + int(np.argmax(y[inicio:fin])))
+    return np.unique(seleccion)
+
+
+# Reduce (horas, valores) a lo sumo a n_puntos; los valores nulos se descartan antes de reducir
+def reducir(horas, valores, n_puntos, metodo="lttb"):
+    if metodo not in METODOS:
+        raise ValueError(f"Método de reducción desconocido: {metodo}")
+    horas = np.asarray(horas, dtype="datetime64[ns]")
+    valores = np.asarray(valores, dtype=np.float64)
+    presentes = ~np.isnan(valores)
+    horas, valores = horas[presentes], valores[presentes]
+
+    x = horas.view(np.int64)
+    indices = indices_lttb(x, valores, n_puntos) if metodo == "lttb" else indices_minmax(x, valores, n_puntos)
+    return horas[indices], valores[indices]
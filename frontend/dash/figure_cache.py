@@ -0,0 +1,74 @@
+"""Caché LRU de figuras ya serializadas a JSON.
+
+Guarda el texto JSON (no los objetos de Plotly), así el tamaño de cada entrada es conocido y un
+acierto evita tanto armar los datos como construir las figuras. Cuando el total supera max_bytes se
+descartan las entradas usadas hace más tiempo.
+"""
+import threading
+from collections import OrderedDict
+
+
+class CacheFiguras:
+
+    # reporte_cada: cada cuántas consultas se imprime la tasa de aciertos
+    def __init__(self, max_bytes, reporte_cada=100):
+        self.max_bytes = max_bytes
+        self.reporte_cada = reporte_cada
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def obtener(self, clave):
+        with self._lock:
+            valor = self._entradas.get(clave)
+            if valor is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entradas.move_to_end(clave)
+            consultas = self.hits + self.misses
+        if consultas % self.reporte_cada == 0:
+            self.reportar()
+        return valor
+
+    def guardar(self, clave, valor):
+        # Una figura más grande que toda la caché no se guarda
+        if len(valor) > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior)
+            self._entradas[clave] = valor
+            self._bytes += len(valor)
+            while self._bytes > self.max_bytes:
+                _, descartado = self._entradas.popitem(last=False)
+                self._bytes -= len(descartado)
+                self.evictions += 1
+
+    # Elimina las entradas cuya clave cumple el predicado
+    def invalidar(self, predicado):
+        with self._lock:
+            for clave in [clave for clave in self._entradas if predicado(clave)]:
+                self._bytes -= len(self._entradas.pop(clave))
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / consultas if consultas else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entradas),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def reportar(self):
+        e = self.estadisticas()
+        print(f"Caché de figuras: {e['hit_rate']:.0%} aciertos ({e['hits']} hits, {e['misses']} misses), "
+              f"{e['entries']} entradas, {e['bytes'] / 1024:.0f} de {e['max_bytes'] / 1024:.0f} kB, {e['evictions']} descartes")
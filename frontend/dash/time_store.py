@@ -0,0 +1,74 @@
+"""Series horarias en memoria indexadas por tiempo.
+
+Las horas se guardan ordenadas y sin repetir en un DatetimeIndex y los valores en una matriz NumPy
+contigua (una columna por serie). Un día o un rango se ubica con búsqueda binaria (searchsorted) y se
+devuelve como vista de esas filas, así el costo de cada consulta no depende del largo de la historia.
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from resampling import rellenar
+
+
+class SerieHoraria:
+
+    def __init__(self, horas, valores, columnas):
+        self.horas = pd.DatetimeIndex(horas)
+        self.valores = np.ascontiguousarray(valores, dtype=np.float64)
+        self.columnas = list(columnas)
+        self._ns = self.horas.to_numpy(dtype="datetime64[ns]")
+
+    # Construye la serie desde un DataFrame con columna 'hour'; las horas repetidas se promedian
+    @classmethod
+    def desde_dataframe(cls, df, columnas):
+        valores = df.set_index("hour")[list(columnas)].astype("float64")
+        if not valores.index.is_unique:
+            valores = valores.groupby(level=0).mean()
+        valores = valores.sort_index()
+        return cls(valores.index, valores.to_numpy(), columnas)
+
+    def __len__(self):
+        return len(self.horas)
+
+    # Posiciones [i, j) de las horas dentro de [inicio, fin]
+    def _limites(self, inicio, fin):
+        i = np.searchsorted(self._ns, np.datetime64(pd.Timestamp(inicio), "ns"), side="left")
+        j = np.searchsorted(self._ns, np.datetime64(pd.Timestamp(fin), "ns"), side="right")
+        return i, j
+
+    # Horas y valores (vistas, sin copiar) entre inicio y fin, ambos incluidos
+    def rango(self, inicio, fin):
+        i, j = self._limites(inicio, fin)
+        return self.horas[i:j], self.valores[i:j]
+
+    # Resumen de las horas y valores entre inicio y fin (toda la serie si se omiten); cambia solo si cambian ellos
+    def huella(self, inicio=None, fin=None):
+        i, j = (0, len(self.horas)) if inicio is None else self._limites(inicio, fin)
+        resumen = hashlib.blake2b(digest_size=16)
+        resumen.update(self._ns[i:j].tobytes())
+        resumen.update(self.valores[i:j].tobytes())
+        return resumen.hexdigest()
+
+    def dataframe(self, inicio, fin):
+        horas, valores = self.rango(inicio, fin)
+        df = pd.DataFrame(valores, columns=self.columnas)
+        df.insert(0, "hour", horas)
+        return df
+
+    # Las 24 horas del día alineadas a la rejilla horaria, con los huecos rellenados según la política.
+    # Devuelve las horas y una matriz (24 x columnas), igual que resampling.completar_horas
+    def dia(self, fecha, politica="linear", max_hueco=None):
+        inicio = np.datetime64(pd.Timestamp(fecha).normalize(), "ns")
+        horas = inicio + np.arange(24) * np.timedelta64(1, "h")
+        i, j = self._limites(horas[0], horas[-1])
+
+        # Cada fila del día va a su posición en la rejilla; las horas que no caen en punto se descartan
+        desplazamiento = self._ns[i:j] - inicio
+        en_punto = desplazamiento % np.timedelta64(1, "h") == np.timedelta64(0, "h")
+        rejilla = np.full((24, len(self.columnas)), np.nan)
+        rejilla[desplazamiento[en_punto] // np.timedelta64(1, "h")] = self.valores[i:j][en_punto]
+
+        completos = rellenar(pd.DataFrame(rejilla, columns=self.columnas), politica, max_hueco)
+        return pd.DatetimeIndex(horas), np.ascontiguousarray(completos.to_numpy(dtype=np.float64))
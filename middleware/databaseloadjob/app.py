@@ -1,11 +1,31 @@
+import argparse
 import psycopg2
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from crate import client
-from datetime import datetime
+import os
 import sys
+import time
+from datetime import date, timedelta
+
+# Módulos compartidos entre aplicaciones (shared/); en las imágenes de Docker se copian junto a la aplicación
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "shared"))
+
+from archive import archivar_rollup
+from checkpoint import crear_tabla_checkpoint
+from extractor import descubrir_entidades
+from ingest_daemon import servir
+from instrumentation import configurar, contar, tramo
+from loader import MODOS_CARGA, reportar_rendimiento
+from partitions import asegurar_particiones, existe_tabla, mantener_particiones, meses_entre, sumar_meses
+from rollup import reconstruir_rollup
+from schema import agregar_columna_entidad, crear_tabla_lecturas, crear_tabla_rollup, migrar_lecturas, rango_tablas_anteriores
+from sync import sincronizar_entidad
 
 # Configuraciones de la conexión
 # CrateDB
 CRATE_URL = "http://10.38.32.137:8083"
+# Entidad a la que pertenecen las lecturas de las tablas anteriores cargadas antes de existir la columna entity_id
+CRATE_ENTITY_ID = "Joselito"
 
 # PostgreSQL
 POSTGRES_HOST = "localhost"
@@ -13,14 +33,50 @@ POSTGRES_PORT = "5432"
 POSTGRES_DB = "postgres"
 POSTGRES_USER = "root"
 POSTGRES_PASSWORD = "password"
+# Tabla única de lecturas (temperatura y humedad en la misma fila)
+POSTGRES_TABLE_READINGS = "readings"
+# Tablas anteriores, una por variable: solo se leen para migrarlas a POSTGRES_TABLE_READINGS
 POSTGRES_TABLE_TEMPERATURE = "temperature"
 POSTGRES_TABLE_HUMIDITY = "humidity"
+POSTGRES_TABLE_HOURLY = "hourly_readings"
 
-try:
+# Tabla de lecturas particionada por mes (partitions.py): meses futuros con partición creada por adelantado y
+# meses que se conservan además del actual (None = sin retención). Las particiones más antiguas se separan
+# de la tabla ("detach", quedan como tablas sueltas) o se borran ("drop"); el resumen por hora no se toca
+PARTICIONES_MESES_ADELANTE = 3
+RETENCION_MESES = None
+RETENCION_ACCION = "detach"
 
-    # Conexión a PostgreSQL
-    print("Conectando a PostgreSQL...")
-    postgres_conn = psycopg2.connect(
+# Archivo en Parquet (archive.py) del resumen por hora: directorio local compartido con predictionjob y el
+# dashboard (None = sin archivo) y días recientes que todavía no se archivan por si llegan lecturas atrasadas.
+# Los meses con horas que cambiaron después de archivarse (lecturas tardías, --reconstruir-rollup) se vuelven a
+# archivar solos en la siguiente ejecución
+ARCHIVO_DIR = "/data/archivo/hourly"
+ARCHIVO_MARGEN_DIAS = 1
+
+# Modo de carga por defecto: "copy" (masivo) o "insert" (fila a fila, ruta anterior)
+MODO_CARGA = "copy"
+
+# Filas por página leídas de CrateDB; limita la memoria usada al ponerse al día tras una caída
+TAM_PAGINA = 5000
+
+# Máximo de entidades sincronizadas en paralelo (cada una usa su propia conexión a CrateDB y a PostgreSQL)
+MAX_WORKERS = 8
+
+# Modo de ingesta continua (--streaming): endpoint de notificaciones y tamaño/latencia de los micro-lotes
+STREAMING_HOST = "0.0.0.0"
+STREAMING_PUERTO = 8080
+STREAMING_TAM_LOTE = 500
+STREAMING_LATENCIA_MAX = 5.0
+
+# Métricas de las etapas al terminar cada ejecución: directorio del textfile collector de node_exporter
+# y URL del Pushgateway (None desactiva cada destino; el resumen siempre se imprime en el log)
+METRICAS_TEXTFILE_DIR = None
+PUSHGATEWAY_URL = None
+
+
+def conectar_postgres():
+    return psycopg2.connect(
         host=POSTGRES_HOST,
         port=POSTGRES_PORT,
         database=POSTGRES_DB,
@@ -28,50 +84,136 @@ try:
         password=POSTGRES_PASSWORD
     )
 
-    # Obtener la última fecha de los datos en PostgreSQL
-    
+
+def conectar_crate():
+    return client.connect(CRATE_URL, error_trace=True)
+
+
+parser = argparse.ArgumentParser(description="Sincroniza las lecturas de CrateDB hacia PostgreSQL")
+parser.add_argument("--modo-carga", choices=sorted(MODOS_CARGA), default=MODO_CARGA)
+parser.add_argument("--tam-pagina", type=int, default=TAM_PAGINA)
+parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+parser.add_argument("--entidad", action="append",
+                    help="Sincroniza solo esta entidad (se puede repetir); por defecto se descubren todas")
+parser.add_argument("--migrar-lecturas", action="store_true",
+                    help=f"Copia a {POSTGRES_TABLE_READINGS} las lecturas de {POSTGRES_TABLE_TEMPERATURE} y {POSTGRES_TABLE_HUMIDITY}")
+parser.add_argument("--streaming", action="store_true",
+                    help="Servicio continuo: recibe notificaciones de Orion/QuantumLeap en lugar de leer CrateDB")
+parser.add_argument("--host", default=STREAMING_HOST)
+parser.add_argument("--puerto", type=int, default=STREAMING_PUERTO)
+parser.add_argument("--tam-lote", type=int, default=STREAMING_TAM_LOTE,
+                    help="Lecturas por lote en modo continuo")
+parser.add_argument("--latencia-max", type=float, default=STREAMING_LATENCIA_MAX,
+                    help="Segundos máximos que una lectura espera antes de escribirse en modo continuo")
+parser.add_argument("--reconstruir-rollup", action="store_true",
+                    help=f"Recalcula {POSTGRES_TABLE_HOURLY} desde todo el historial crudo")
+args = parser.parse_args()
+
+metricas = configurar("databaseloadjob_streaming" if args.streaming else "databaseloadjob")
+postgres_conn = cursor_pg = crate_conn = cursor_crate = None
+
+try:
+
+    # Conexión a PostgreSQL
+    print("Conectando a PostgreSQL...")
+    with tramo("connect", destino="postgres"):
+        postgres_conn = conectar_postgres()
     cursor_pg = postgres_conn.cursor()
-    last_date_temp_query = f"SELECT MAX(timestamp) FROM {POSTGRES_TABLE_TEMPERATURE};"
-    cursor_pg.execute(last_date_temp_query)
-    last_date_temp = cursor_pg.fetchone()[0]
 
-    last_date_humidity_query = f"SELECT MAX(timestamp) FROM {POSTGRES_TABLE_HUMIDITY};"
-    cursor_pg.execute(last_date_humidity_query)
-    last_date_humidity = cursor_pg.fetchone()[0]
+    # Tabla única de lecturas; las escrituras son idempotentes gracias al índice único (entity_id, timestamp)
+    tabla_nueva = not existe_tabla(cursor_pg, POSTGRES_TABLE_READINGS)
+    crear_tabla_lecturas(cursor_pg, POSTGRES_TABLE_READINGS)
+    creadas, retiradas = mantener_particiones(cursor_pg, POSTGRES_TABLE_READINGS, PARTICIONES_MESES_ADELANTE,
+                                              RETENCION_MESES, RETENCION_ACCION)
+    if creadas or retiradas:
+        print(f"Particiones de {POSTGRES_TABLE_READINGS}: creadas {creadas or '-'}, retiradas ({RETENCION_ACCION}) {retiradas or '-'}")
+    crear_tabla_checkpoint(cursor_pg)
+    crear_tabla_rollup(cursor_pg, POSTGRES_TABLE_HOURLY)
+    postgres_conn.commit()
+
+    # Al crear la tabla única (o con --migrar-lecturas) se copian las lecturas de las tablas anteriores, un mes por
+    # transacción; si se interrumpe, se retoma con --migrar-lecturas
+    anteriores = (POSTGRES_TABLE_TEMPERATURE, POSTGRES_TABLE_HUMIDITY)
+    if (tabla_nueva or args.migrar_lecturas) and all(existe_tabla(cursor_pg, tabla) for tabla in anteriores):
+        for tabla in anteriores:
+            agregar_columna_entidad(cursor_pg, tabla, CRATE_ENTITY_ID)
+        rango = rango_tablas_anteriores(cursor_pg, *anteriores)
+        if rango:
+            primer_mes, ultimo_mes = rango[0].date(), rango[1].date()
+            asegurar_particiones(cursor_pg, POSTGRES_TABLE_READINGS, primer_mes, ultimo_mes)
+            postgres_conn.commit()
+            migradas = 0
+            for mes in meses_entre(primer_mes, ultimo_mes):
+                with tramo("migrate"):
+                    migradas += migrar_lecturas(cursor_pg, POSTGRES_TABLE_READINGS, *anteriores, mes, sumar_meses(mes, 1))
+                    postgres_conn.commit()
+            print(f"Migración a {POSTGRES_TABLE_READINGS}: {migradas} lecturas copiadas de {' y '.join(anteriores)}")
+        if args.migrar_lecturas:
+            sys.exit(0)
 
-    if last_date_temp < last_date_humidity:
-        last_date = last_date_temp
-    else:
-        last_date = last_date_humidity
+    # Con el rollup vacío (primera ejecución) se carga una vez con el historial existente
+    cursor_pg.execute(f"SELECT 1 FROM {POSTGRES_TABLE_HOURLY} LIMIT 1;")
+    if args.reconstruir_rollup or cursor_pg.fetchone() is None:
+        horas = reconstruir_rollup(cursor_pg, POSTGRES_TABLE_READINGS, POSTGRES_TABLE_HOURLY)
+        postgres_conn.commit()
+        print(f"Rollup {POSTGRES_TABLE_HOURLY} reconstruido: {horas} horas")
+        if args.reconstruir_rollup:
+            sys.exit(0)
 
+    if args.streaming:
+        servir(conectar_postgres, POSTGRES_TABLE_READINGS, POSTGRES_TABLE_HOURLY,
+               args.host, args.puerto, args.tam_lote, args.latencia_max)
+        sys.exit(0)
 
     # Conexión a CrateDB
     print("Conectando a CrateDB...")
-    crate_conn = client.connect(CRATE_URL, error_trace=True)
+    with tramo("connect", destino="crate"):
+        crate_conn = conectar_crate()
     cursor_crate = crate_conn.cursor()
-    crate_query = crate_query = f""" SELECT time_index, temp, humedad  FROM doc.etvariables WHERE entity_id = 'Joselito' AND time_index >= '{last_date}' LIMIT 10000; """
-    cursor_crate.execute(crate_query)
-    crate_data = cursor_crate.fetchall()
-    
-    print(f"Datos capturados de CrateDB: {len(crate_data)} filas")
-
-    
+    entidades = args.entidad or descubrir_entidades(cursor_crate)
+    print(f"Entidades a sincronizar: {len(entidades)}")
 
-    # Inserción de los datos en la tabla PostgreSQL
+    # Cada entidad corre en su propio hilo; el tiempo total lo marca la entidad más lenta
     print("Insertando datos en PostgreSQL...")
-    for row in crate_data:
-        time_index, temp, humedad = row
-        # Convertir el timestamp de milisegundos a un objeto datetime
-        timestamp = datetime.fromtimestamp(time_index / 1000.0)
-        insert_temp_query = f"INSERT INTO {POSTGRES_TABLE_TEMPERATURE} (value, timestamp) VALUES (%s,%s)"
-        insert_humidity_query = f"INSERT INTO {POSTGRES_TABLE_HUMIDITY} (value, timestamp) VALUES (%s,%s)"
-        cursor_pg.execute(insert_temp_query, (temp,timestamp))
-        cursor_pg.execute(insert_humidity_query, (humedad,timestamp))
-    # Guardar los cambios definitivamente
-    postgres_conn.commit()
-    
+    total_filas = 0
+    fallidas = []
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futuros = {
+            pool.submit(sincronizar_entidad, conectar_postgres, conectar_crate, entidad,
+                        POSTGRES_TABLE_READINGS, POSTGRES_TABLE_HOURLY, args.modo_carga, args.tam_pagina): entidad
+            for entidad in entidades
+        }
+        for futuro in as_completed(futuros):
+            entidad = futuros[futuro]
+            try:
+                n_filas, duracion = futuro.result()
+            except Exception as e:
+                print(f"[{entidad}] Ha ocurrido un error: {e}")
+                fallidas.append(entidad)
+                continue
+            total_filas += n_filas
+            reportar_rendimiento(f"{args.modo_carga} [{entidad}] (total)", n_filas, duracion)
+
+    print(f"Datos capturados de CrateDB: {total_filas} filas")
+    reportar_rendimiento(f"{args.modo_carga} (total)", total_filas, time.perf_counter() - inicio)
+
+    if fallidas:
+        raise RuntimeError(f"Fallaron {len(fallidas)} entidades: {', '.join(fallidas)}")
+
     print("Datos insertados en PostgreSQL con éxito.")
 
+    # Los días cerrados del resumen por hora pasan al archivo una sola vez
+    if ARCHIVO_DIR:
+        with tramo("archive"):
+            archivadas, rearchivadas = archivar_rollup(cursor_pg, POSTGRES_TABLE_HOURLY, ARCHIVO_DIR,
+                                                       date.today() - timedelta(days=ARCHIVO_MARGEN_DIAS))
+        contar("archive", filas=sum(archivadas.values()))
+        print(f"Archivo {ARCHIVO_DIR}: {sum(archivadas.values())} horas archivadas de {len(archivadas)} entidades")
+        if rearchivadas:
+            print(f"Archivo {ARCHIVO_DIR}: {sum(rearchivadas.values())} meses con cambios tardíos vueltos a archivar "
+                  f"({', '.join(sorted(rearchivadas))})")
+
 except Exception as e:
     print(f"Ha ocurrido un error: {e}")
     sys.exit(1)
@@ -87,3 +229,4 @@ finally:
     if postgres_conn:
         postgres_conn.close()
     print("Conexiones cerradas.")
+    metricas.exportar(METRICAS_TEXTFILE_DIR, PUSHGATEWAY_URL)
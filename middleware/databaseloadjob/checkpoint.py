@@ -0,0 +1,39 @@
+# Tabla donde se guarda la marca de agua (último time_index sincronizado) de cada entidad
+TABLA_CHECKPOINT = "sync_checkpoint"
+
+
+def crear_tabla_checkpoint(cursor_pg):
+    cursor_pg.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLA_CHECKPOINT} (
+            entity_id TEXT PRIMARY KEY,
+            last_time_index BIGINT NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+    """)
+
+
+# Devuelve el último time_index (milisegundos) sincronizado para la entidad, o None si no hay checkpoint
+def leer_checkpoint(cursor_pg, entidad):
+    cursor_pg.execute(f"SELECT last_time_index FROM {TABLA_CHECKPOINT} WHERE entity_id = %s;", (entidad,))
+    fila = cursor_pg.fetchone()
+    return fila[0] if fila else None
+
+
+# Se ejecuta en la misma transacción que la carga de la página, así el checkpoint nunca adelanta a los datos
+def guardar_checkpoint(cursor_pg, entidad, time_index_ms):
+    cursor_pg.execute(f"""
+        INSERT INTO {TABLA_CHECKPOINT} (entity_id, last_time_index, updated_at)
+        VALUES (%s, %s, now())
+        ON CONFLICT (entity_id) DO UPDATE
+        SET last_time_index = EXCLUDED.last_time_index, updated_at = EXCLUDED.updated_at;
+    """, (entidad, time_index_ms))
+
+
+# Solo para la primera ejecución: toma la fecha más reciente ya cargada en PostgreSQL (lo que hacía el job antes)
+def checkpoint_inicial(cursor_pg, entidad, tabla_lecturas):
+    cursor_pg.execute(f"SELECT MAX(timestamp) FROM {tabla_lecturas} WHERE entity_id = %s;", (entidad,))
+    ultima_fecha = cursor_pg.fetchone()[0]
+    if ultima_fecha is None:
+        return None
+    # Mismo criterio que la conversión de la carga (datetime.fromtimestamp, hora local)
+    return int(ultima_fecha.timestamp() * 1000)
@@ -0,0 +1,35 @@
+from instrumentation import contar, tramo
+
+# Consulta paginada por clave (keyset): cada página continúa donde terminó la anterior,
+# así no se usa OFFSET y el costo de cada página no crece con el atraso acumulado
+CRATE_QUERY_PAGINA = """
+    SELECT time_index, temp, humedad
+    FROM doc.etvariables
+    WHERE entity_id = ? AND time_index > ?
+    ORDER BY time_index
+    LIMIT ?
+"""
+
+
+# Recorre doc.etvariables en orden de time_index y entrega una página a la vez.
+# Las lecturas de una entidad tienen time_index distinto, por eso basta con continuar desde el último visto
+def extraer_paginas(cursor_crate, entidad, desde_ms, tam_pagina):
+    # Sin checkpoint se empieza desde el inicio de la serie
+    ultimo_ms = desde_ms if desde_ms is not None else -1
+    while True:
+        with tramo("extract"):
+            cursor_crate.execute(CRATE_QUERY_PAGINA, (entidad, ultimo_ms, tam_pagina))
+            pagina = cursor_crate.fetchall()
+        contar("extract", filas=len(pagina))
+        if not pagina:
+            return
+        yield pagina
+        ultimo_ms = pagina[-1][0]
+        if len(pagina) < tam_pagina:
+            return
+
+
+# Lista todas las entidades (nodos sensores) que tienen lecturas en doc.etvariables
+def descubrir_entidades(cursor_crate):
+    cursor_crate.execute("SELECT entity_id FROM doc.etvariables GROUP BY entity_id ORDER BY entity_id;")
+    return [fila[0] for fila in cursor_crate.fetchall()]
@@ -0,0 +1,266 @@
+"""Modo de ingesta continua: recibe las notificaciones de suscripción de Orion/QuantumLeap
+por HTTP, las agrupa en micro-lotes y las escribe en PostgreSQL sin esperar al cron."""
+import json
+import math
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import psycopg2
+
+from instrumentation import REGISTRO, contar, tramo
+from loader import copiar_lecturas
+from rollup import actualizar_rollup_lecturas
+
+# Atributos de la entidad en CrateDB/Orion
+ATRIBUTO_TEMPERATURA = "temp"
+ATRIBUTO_HUMEDAD = "humedad"
+
+# Un lote que falla porque no hay conexión con PostgreSQL vuelve a la cola a lo sumo MAX_REINTENTOS veces,
+# esperando cada vez el doble (hasta ESPERA_MAX_REINTENTO_S segundos); después se descarta
+MAX_REINTENTOS = 8
+ESPERA_MAX_REINTENTO_S = 30
+ERRORES_CONEXION = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+# Valor de un atributo en formato normalizado ({"type": ..., "value": ...}) o keyValues (valor directo)
+def _valor(atributo):
+    if isinstance(atributo, dict):
+        return atributo.get("value")
+    return atributo
+
+
+# Valor de temperatura o humedad como float (None si viene vacío); ValueError si no es un número finito
+def _numero(atributo):
+    valor = _valor(atributo)
+    if valor is None:
+        return None
+    if isinstance(valor, bool) or not isinstance(valor, (int, float, str)):
+        raise ValueError(f"valor no numérico: {valor!r}")
+    try:
+        numero = float(valor)
+    except ValueError:
+        raise ValueError(f"valor no numérico: {valor!r}") from None
+    if not math.isfinite(numero):
+        raise ValueError(f"valor no finito: {valor!r}")
+    return numero
+
+
+# Convierte una fecha ISO 8601 a la misma hora local sin zona que usa la carga desde CrateDB
+def _fecha(texto):
+    if not texto:
+        return None
+    try:
+        fecha = datetime.fromisoformat(texto.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return datetime.fromtimestamp(fecha.timestamp())
+
+
+# Marca de tiempo de la lectura: observedAt (NGSI-LD), metadata TimeInstant (NGSI v2) o la de la notificación
+def _fecha_lectura(entidad, atributo, notificado):
+    if isinstance(atributo, dict):
+        fecha = _fecha(atributo.get("observedAt"))
+        if fecha:
+            return fecha
+        fecha = _fecha(_valor(atributo.get("metadata", {}).get("TimeInstant")))
+        if fecha:
+            return fecha
+    return _fecha(_valor(entidad.get("TimeInstant"))) or notificado
+
+
+# Extrae las lecturas (entidad, timestamp, temp, humedad) de una notificación NGSI-LD o NGSI v2.
+# Un "data" que no es una lista, una entidad sin id de texto o con valores no numéricos invalida la notificación
+# completa (ValueError)
+def extraer_lecturas(notificacion):
+    notificado = _fecha(notificacion.get("notifiedAt")) or datetime.now()
+    entidades = notificacion.get("data", [])
+    if not isinstance(entidades, list):
+        raise ValueError(f"data debe ser una lista: {type(entidades).__name__}")
+    lecturas = []
+    for entidad in entidades:
+        temp = entidad.get(ATRIBUTO_TEMPERATURA)
+        humedad = entidad.get(ATRIBUTO_HUMEDAD)
+        if temp is None and humedad is None:
+            continue
+        id_entidad = entidad["id"]
+        if not isinstance(id_entidad, str) or not id_entidad:
+            raise ValueError(f"id de entidad inválido: {id_entidad!r}")
+        timestamp = _fecha_lectura(entidad, temp if temp is not None else humedad, notificado)
+        lecturas.append((id_entidad, timestamp, _numero(temp), _numero(humedad)))
+    return lecturas
+
+
+class AcumuladorLecturas:
+    """Junta lecturas y las escribe cuando el lote llega a tam_lote o la más antigua cumple latencia_max segundos."""
+
+    def __init__(self, conectar_postgres, tabla_lecturas, tabla_rollup, tam_lote, latencia_max):
+        self.conectar_postgres = conectar_postgres
+        self.tabla_lecturas = tabla_lecturas
+        self.tabla_rollup = tabla_rollup
+        self.tam_lote = tam_lote
+        self.latencia_max = latencia_max
+        self._pendientes = []
+        self._primera_pendiente = None
+        self._condicion = threading.Condition()
+        self._detener = False
+        self._conexion = None
+        # Fallos de conexión seguidos del lote que está al frente de la cola
+        self._reintentos = 0
+        self._hilo = threading.Thread(target=self._ciclo, name="flush-lecturas", daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+
+    def agregar(self, lecturas):
+        if not lecturas:
+            return
+        with self._condicion:
+            if not self._pendientes:
+                self._primera_pendiente = time.monotonic()
+            self._pendientes.extend(lecturas)
+            if len(self._pendientes) >= self.tam_lote:
+                self._condicion.notify()
+
+    def detener(self):
+        with self._condicion:
+            self._detener = True
+            self._condicion.notify()
+        self._hilo.join()
+        if self._conexion:
+            self._conexion.close()
+
+    def _ciclo(self):
+        while True:
+            with self._condicion:
+                while not self._detener:
+                    if len(self._pendientes) >= self.tam_lote:
+                        break
+                    if self._pendientes:
+                        restante = self.latencia_max - (time.monotonic() - self._primera_pendiente)
+                        if restante <= 0:
+                            break
+                        self._condicion.wait(restante)
+                    else:
+                        self._condicion.wait()
+                lote = self._pendientes[:self.tam_lote]
+                del self._pendientes[:self.tam_lote]
+                espera = time.monotonic() - self._primera_pendiente if lote else 0.0
+                self._primera_pendiente = time.monotonic() if self._pendientes else None
+                detener = self._detener
+
+            if lote:
+                escrito = self._escribir(lote, espera)
+                if detener and not escrito:
+                    print(f"Se descartan {len(lote) + len(self._pendientes)} lecturas pendientes al detener")
+                    return
+            elif detener:
+                return
+
+    # Escribe el lote en una transacción; si falla deja la conexión lista para el siguiente intento
+    def _escribir_transaccion(self, lote):
+        try:
+            if self._conexion is None or self._conexion.closed:
+                with tramo("connect", destino="postgres"):
+                    self._conexion = self.conectar_postgres()
+            with self._conexion.cursor() as cursor_pg:
+                with tramo("insert", modo="streaming"):
+                    copiar_lecturas(cursor_pg, lote, self.tabla_lecturas)
+                actualizar_rollup_lecturas(cursor_pg, lote, self.tabla_lecturas, self.tabla_rollup)
+            self._conexion.commit()
+        except Exception:
+            if self._conexion is not None and not self._conexion.closed:
+                self._conexion.rollback()
+            raise
+
+    # Un lote rechazado por sus datos se divide en mitades hasta aislar las lecturas que PostgreSQL no acepta,
+    # que se descartan; devuelve la cantidad de lecturas escritas
+    def _escribir_por_partes(self, lote):
+        try:
+            self._escribir_transaccion(lote)
+            return len(lote)
+        except ERRORES_CONEXION:
+            raise
+        except Exception as e:
+            if len(lote) == 1:
+                print(f"Se descarta la lectura {lote[0]}: {e}")
+                return 0
+            mitad = len(lote) // 2
+            return self._escribir_por_partes(lote[:mitad]) + self._escribir_por_partes(lote[mitad:])
+
+    def _escribir(self, lote, espera):
+        inicio = time.perf_counter()
+        try:
+            escritas = self._escribir_por_partes(lote)
+        except ERRORES_CONEXION as e:
+            print(f"Ha ocurrido un error escribiendo {len(lote)} lecturas: {e}")
+            if self._detener:
+                return False
+            self._reintentos += 1
+            if self._reintentos > MAX_REINTENTOS:
+                print(f"Se descartan {len(lote)} lecturas después de {MAX_REINTENTOS} reintentos")
+                self._reintentos = 0
+                return False
+            # Las lecturas vuelven a la cola; reinsertarlas es seguro porque la carga es idempotente
+            with self._condicion:
+                self._pendientes[:0] = lote
+                if self._primera_pendiente is None:
+                    self._primera_pendiente = time.monotonic()
+            time.sleep(min(2 ** (self._reintentos - 1), ESPERA_MAX_REINTENTO_S))
+            return False
+        self._reintentos = 0
+        contar("insert", filas=escritas)
+        duracion = time.perf_counter() - inicio
+        descartadas = f", {len(lote) - escritas} descartadas" if escritas < len(lote) else ""
+        print(f"Lote de {len(lote)} lecturas escrito en {duracion:.3f} s (espera en cola {espera:.2f} s){descartadas}")
+        return True
+
+
+def crear_manejador(acumulador):
+    class ManejadorNotificaciones(BaseHTTPRequestHandler):
+        def do_POST(self):
+            try:
+                longitud = int(self.headers.get("Content-Length", 0))
+                notificacion = json.loads(self.rfile.read(longitud) or b"{}")
+                lecturas = extraer_lecturas(notificacion)
+            except (ValueError, KeyError, AttributeError, TypeError) as e:
+                self.send_error(400, f"Notificación inválida: {e}")
+                return
+            acumulador.agregar(lecturas)
+            self.send_response(204)
+            self.end_headers()
+
+        # Métricas de las etapas en formato de texto de Prometheus
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            cuerpo = REGISTRO.exposicion().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        # Sin un print por petición; el resumen va en cada lote escrito
+        def log_message(self, format, *args):
+            pass
+
+    return ManejadorNotificaciones
+
+
+# Atiende notificaciones hasta recibir Ctrl+C; al salir se escribe lo que quede pendiente
+def servir(conectar_postgres, tabla_lecturas, tabla_rollup, host, puerto, tam_lote, latencia_max):
+    acumulador = AcumuladorLecturas(conectar_postgres, tabla_lecturas, tabla_rollup, tam_lote, latencia_max)
+    acumulador.iniciar()
+    servidor = ThreadingHTTPServer((host, puerto), crear_manejador(acumulador))
+    print(f"Escuchando notificaciones en http://{host}:{puerto}/ (lote={tam_lote}, latencia máx={latencia_max} s)")
+    print(f"Métricas en http://{host}:{puerto}/metrics")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        acumulador.detener()
@@ -0,0 +1,94 @@
+import io
+import time
+from datetime import datetime
+
+from instrumentation import contar, tramo
+
+# Tabla temporal donde se reciben las lecturas antes de pasarlas (sin duplicados) a las tablas finales
+TABLA_STAGING = "_staging_lecturas"
+
+
+# Convierte un valor a su representación en el formato de texto de COPY (None -> \N)
+def _valor_copy(valor):
+    if valor is None:
+        return "\\N"
+    return str(valor)
+
+
+# Texto en el formato de COPY: la barra invertida, el tabulador y los saltos de línea se escapan
+def _texto_copy(texto):
+    return texto.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+# Convierte las filas de CrateDB (time_index en milisegundos) a lecturas (entidad, timestamp, temp, humedad)
+def lecturas_de_crate(filas, entidad):
+    for time_index, temp, humedad in filas:
+        # Convertir el timestamp de milisegundos a un objeto datetime
+        yield entidad, datetime.fromtimestamp(time_index / 1000.0), temp, humedad
+
+
+# Recorre una sola vez las lecturas y arma en memoria el buffer con temperatura y humedad
+def construir_buffer(lecturas):
+    buffer = io.StringIO()
+    for entidad, timestamp, temp, humedad in lecturas:
+        buffer.write(f"{_texto_copy(entidad)}\t{timestamp.isoformat(sep=' ')}\t{_valor_copy(temp)}\t{_valor_copy(humedad)}\n")
+    buffer.seek(0)
+    return buffer
+
+
+# Carga masiva con COPY ... FROM STDIN hacia la tabla temporal y de ahí a la tabla de lecturas con
+# ON CONFLICT DO NOTHING, así volver a recibir las mismas lecturas (filas del límite, reintentos) no genera duplicados
+def copiar_lecturas(cursor_pg, lecturas, tabla_lecturas):
+    cursor_pg.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS {TABLA_STAGING} (
+            entity_id TEXT,
+            timestamp TIMESTAMP,
+            temp DOUBLE PRECISION,
+            humedad DOUBLE PRECISION
+        ) ON COMMIT DELETE ROWS;
+    """)
+    buffer = construir_buffer(lecturas)
+    # Tamaño del texto enviado por COPY (un carácter por byte salvo en ids de entidad no ASCII)
+    contar("insert", bytes_=buffer.seek(0, io.SEEK_END))
+    buffer.seek(0)
+    cursor_pg.copy_expert(f"COPY {TABLA_STAGING} (entity_id, timestamp, temp, humedad) FROM STDIN", buffer)
+    cursor_pg.execute(f"""
+        INSERT INTO {tabla_lecturas} (entity_id, timestamp, temperature, humidity)
+        SELECT entity_id, timestamp, temp, humedad FROM {TABLA_STAGING}
+        ON CONFLICT (entity_id, timestamp) DO NOTHING;
+    """)
+    cursor_pg.execute(f"TRUNCATE {TABLA_STAGING};")
+
+
+def cargar_copy(cursor_pg, filas, entidad, tabla_lecturas):
+    copiar_lecturas(cursor_pg, lecturas_de_crate(filas, entidad), tabla_lecturas)
+    return len(filas)
+
+
+# Ruta anterior: un INSERT por fila (se conserva para poder comparar)
+def cargar_insert(cursor_pg, filas, entidad, tabla_lecturas):
+    insert_query = f"INSERT INTO {tabla_lecturas} (entity_id, timestamp, temperature, humidity) VALUES (%s,%s,%s,%s) ON CONFLICT (entity_id, timestamp) DO NOTHING"
+    for _, timestamp, temp, humedad in lecturas_de_crate(filas, entidad):
+        cursor_pg.execute(insert_query, (entidad, timestamp, temp, humedad))
+    return len(filas)
+
+
+MODOS_CARGA = {
+    "copy": cargar_copy,
+    "insert": cargar_insert,
+}
+
+
+# Ejecuta la carga con el modo indicado y mide el rendimiento en filas por segundo
+def cargar(cursor_pg, filas, entidad, tabla_lecturas, modo="copy"):
+    inicio = time.perf_counter()
+    with tramo("insert", modo=modo):
+        n_filas = MODOS_CARGA[modo](cursor_pg, filas, entidad, tabla_lecturas)
+    duracion = time.perf_counter() - inicio
+    contar("insert", filas=n_filas)
+    return n_filas, duracion
+
+
+def reportar_rendimiento(modo, n_filas, duracion):
+    filas_por_segundo = n_filas / duracion if duracion > 0 else float("inf")
+    print(f"Carga '{modo}': {n_filas} filas en {duracion:.3f} s ({filas_por_segundo:.0f} filas/s)")
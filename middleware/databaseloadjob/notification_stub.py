@@ -0,0 +1,62 @@
+"""Simula las notificaciones de suscripción de Orion/QuantumLeap para probar el modo de ingesta continua.
+
+Ejemplo: python notification_stub.py --url http://localhost:8080/notify --entidades 5 --notificaciones 100
+"""
+import argparse
+import json
+import random
+import time
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+
+
+def _fecha_iso(fecha):
+    return fecha.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+# Notificación NGSI-LD con una lectura de temperatura y humedad por entidad
+def construir_notificacion(entidades, fecha):
+    return {
+        "id": f"urn:ngsi-ld:Notification:{uuid.uuid4()}",
+        "type": "Notification",
+        "subscriptionId": "urn:ngsi-ld:Subscription:stub",
+        "notifiedAt": _fecha_iso(fecha),
+        "data": [
+            {
+                "id": entidad,
+                "type": "etvariables",
+                "temp": {"type": "Property", "value": round(random.uniform(15, 30), 2), "observedAt": _fecha_iso(fecha)},
+                "humedad": {"type": "Property", "value": round(random.uniform(30, 80), 2), "observedAt": _fecha_iso(fecha)},
+            }
+            for entidad in entidades
+        ],
+    }
+
+
+def enviar(url, notificacion):
+    peticion = urllib.request.Request(
+        url,
+        data=json.dumps(notificacion).encode("utf-8"),
+        headers={"Content-Type": "application/ld+json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(peticion) as respuesta:
+        return respuesta.status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Envía notificaciones NGSI-LD simuladas al modo de ingesta continua")
+    parser.add_argument("--url", default="http://localhost:8080/notify")
+    parser.add_argument("--entidades", type=int, default=3)
+    parser.add_argument("--notificaciones", type=int, default=50)
+    parser.add_argument("--intervalo", type=float, default=0.1, help="Segundos entre notificaciones")
+    args = parser.parse_args()
+
+    entidades = [f"stub-{i:03d}" for i in range(args.entidades)]
+    inicio = time.perf_counter()
+    for _ in range(args.notificaciones):
+        enviar(args.url, construir_notificacion(entidades, datetime.now(timezone.utc)))
+        time.sleep(args.intervalo)
+    duracion = time.perf_counter() - inicio
+    print(f"Enviadas {args.notificaciones} notificaciones ({args.notificaciones * args.entidades} lecturas) en {duracion:.2f} s")
@@ -0,0 +1,120 @@
+"""Tablas de lecturas particionadas por mes sobre timestamp.
+
+La tabla cruda de lecturas es una tabla particionada por rango con una partición por mes
+(<tabla>_pAAAAMM) y una partición por defecto para las lecturas fuera de los meses creados. Los índices
+se definen en la tabla padre y PostgreSQL los crea en cada partición: el único (entity_id, timestamp) que
+usan la carga idempotente y las consultas de la última lectura, y un BRIN sobre timestamp para los
+recorridos por rango de tiempo, que ocupa unas pocas páginas por partición porque las lecturas llegan en
+orden. Las consultas acotadas en el tiempo solo leen las particiones de ese rango.
+
+Las particiones de los próximos meses se crean por adelantado en cada ejecución del job y las que quedan
+fuera de la ventana de retención se separan de la tabla (DETACH, quedan como tablas sueltas) o se borran.
+"""
+import re
+from datetime import date
+
+# Lecturas fuera de los meses con partición propia
+SUFIJO_DEFECTO = "default"
+
+
+def nombre_particion(tabla, mes):
+    return f"{tabla}_p{mes.year}{mes.month:02d}"
+
+
+def nombre_indice_brin(tabla):
+    return f"{tabla}_timestamp_brin"
+
+
+# Primer día del mes de la fecha, desplazado n meses
+def sumar_meses(fecha, n):
+    total = fecha.year * 12 + fecha.month - 1 + n
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def meses_entre(desde, hasta):
+    mes = sumar_meses(desde, 0)
+    while mes <= hasta:
+        yield mes
+        mes = sumar_meses(mes, 1)
+
+
+def existe_tabla(cursor_pg, tabla):
+    cursor_pg.execute("SELECT to_regclass(%s) IS NOT NULL;", (tabla,))
+    return cursor_pg.fetchone()[0]
+
+
+# Tabla padre (columnas: definición SQL, con entity_id y timestamp) con sus índices y la partición por defecto;
+# nombre_indice_unico viene de schema.py
+def crear_tabla_particionada(cursor_pg, tabla, columnas, nombre_indice_unico):
+    cursor_pg.execute(f"CREATE TABLE IF NOT EXISTS {tabla} ({columnas}) PARTITION BY RANGE (timestamp);")
+    cursor_pg.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {nombre_indice_unico} ON {tabla} (entity_id, timestamp);")
+    cursor_pg.execute(f"CREATE INDEX IF NOT EXISTS {nombre_indice_brin(tabla)} ON {tabla} USING BRIN (timestamp);")
+    cursor_pg.execute(f"CREATE TABLE IF NOT EXISTS {tabla}_{SUFIJO_DEFECTO} PARTITION OF {tabla} DEFAULT;")
+
+
+# Crea las particiones mensuales que falten entre los meses de desde y hasta (ambos incluidos).
+# Las lecturas de ese mes que hayan caído en la partición por defecto se mueven a la nueva partición antes de
+# adjuntarla (ATTACH falla si la partición por defecto tiene filas del rango). Devuelve las particiones creadas
+def asegurar_particiones(cursor_pg, tabla, desde, hasta):
+    existentes = {nombre for nombre, _ in listar_particiones(cursor_pg, tabla)}
+    creadas = []
+    for mes in meses_entre(desde, hasta):
+        particion = nombre_particion(tabla, mes)
+        if particion in existentes:
+            continue
+        limites = {"desde": mes, "hasta": sumar_meses(mes, 1)}
+        cursor_pg.execute(f"CREATE TABLE {particion} (LIKE {tabla} INCLUDING DEFAULTS);")
+        cursor_pg.execute(f"""
+            WITH movidas AS (
+                DELETE FROM {tabla}_{SUFIJO_DEFECTO}
+                WHERE timestamp >= %(desde)s AND timestamp < %(hasta)s
+                RETURNING *
+            )
+            INSERT INTO {particion} SELECT * FROM movidas;
+        """, limites)
+        cursor_pg.execute(f"""
+            ALTER TABLE {tabla} ATTACH PARTITION {particion}
+            FOR VALUES FROM ('{limites["desde"].isoformat()}') TO ('{limites["hasta"].isoformat()}');
+        """)
+        creadas.append(particion)
+    return creadas
+
+
+# Particiones mensuales de la tabla como (nombre, primer día del mes), ordenadas por mes
+def listar_particiones(cursor_pg, tabla):
+    cursor_pg.execute("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s);
+    """, (tabla,))
+    patron = re.compile(rf"^{re.escape(tabla)}_p(\d{{4}})(\d{{2}})$")
+    particiones = []
+    for (nombre,) in cursor_pg.fetchall():
+        coincidencia = patron.match(nombre)
+        if coincidencia:
+            particiones.append((nombre, date(int(coincidencia.group(1)), int(coincidencia.group(2)), 1)))
+    return sorted(particiones, key=lambda particion: particion[1])
+
+
+# Separa ("detach") o borra ("drop") las particiones de los meses anteriores a la ventana de retención
+# (el mes actual y los `meses` anteriores se conservan). Devuelve los nombres de las particiones afectadas
+def aplicar_retencion(cursor_pg, tabla, meses, accion="detach", hoy=None):
+    if accion not in ("detach", "drop"):
+        raise ValueError(f"Acción de retención desconocida: {accion}")
+    corte = sumar_meses(hoy or date.today(), -meses)
+    afectadas = []
+    for particion, mes in listar_particiones(cursor_pg, tabla):
+        if mes >= corte:
+            break
+        cursor_pg.execute(f"ALTER TABLE {tabla} DETACH PARTITION {particion};")
+        if accion == "drop":
+            cursor_pg.execute(f"DROP TABLE {particion};")
+        afectadas.append(particion)
+    return afectadas
+
+
+# Mantenimiento de cada ejecución: particiones de los próximos meses y retención
+def mantener_particiones(cursor_pg, tabla, meses_adelante, retencion_meses=None, accion_retencion="detach"):
+    hoy = date.today()
+    creadas = asegurar_particiones(cursor_pg, tabla, hoy, sumar_meses(hoy, meses_adelante))
+    afectadas = aplicar_retencion(cursor_pg, tabla, retencion_meses, accion_retencion, hoy) if retencion_meses else []
+    return creadas, afectadas
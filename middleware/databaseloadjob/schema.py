@@ -0,0 +1,84 @@
+from partitions import crear_tabla_particionada
+
+
+# Índice único que identifica una lectura: (entidad, timestamp)
+def nombre_indice_unico(tabla):
+    return f"{tabla}_entity_timestamp_uq"
+
+
+# Agrega la columna de entidad; las filas existentes pertenecen a la entidad original
+def agregar_columna_entidad(cursor_pg, tabla, entidad_por_defecto):
+    cursor_pg.execute(
+        f"ALTER TABLE {tabla} ADD COLUMN IF NOT EXISTS entity_id TEXT NOT NULL DEFAULT %s;",
+        (entidad_por_defecto,)
+    )
+
+
+# Tabla única de lecturas: cada lectura de CrateDB (time_index, temp, humedad) es una fila, particionada por mes
+COLUMNAS_LECTURAS = """
+    entity_id TEXT NOT NULL,
+    timestamp TIMESTAMP NOT NULL,
+    temperature DOUBLE PRECISION,
+    humidity DOUBLE PRECISION
+"""
+
+
+def crear_tabla_lecturas(cursor_pg, tabla):
+    crear_tabla_particionada(cursor_pg, tabla, COLUMNAS_LECTURAS, nombre_indice_unico(tabla))
+
+
+# Copia a la tabla única las lecturas de [desde, hasta) de las tablas anteriores (una por variable), uniendo
+# temperatura y humedad por (entity_id, timestamp). Es idempotente: se puede repetir o retomar por meses.
+# Devuelve las filas insertadas
+def migrar_lecturas(cursor_pg, tabla_lecturas, tabla_temperatura, tabla_humedad, desde, hasta):
+    cursor_pg.execute(f"""
+        WITH t AS (
+            SELECT entity_id, timestamp, value FROM {tabla_temperatura}
+            WHERE timestamp >= %(desde)s AND timestamp < %(hasta)s
+        ), h AS (
+            SELECT entity_id, timestamp, value FROM {tabla_humedad}
+            WHERE timestamp >= %(desde)s AND timestamp < %(hasta)s
+        )
+        INSERT INTO {tabla_lecturas} (entity_id, timestamp, temperature, humidity)
+        SELECT COALESCE(t.entity_id, h.entity_id), COALESCE(t.timestamp, h.timestamp), t.value, h.value
+        FROM t FULL OUTER JOIN h ON t.entity_id = h.entity_id AND t.timestamp = h.timestamp
+        ON CONFLICT (entity_id, timestamp) DO NOTHING;
+    """, {"desde": desde, "hasta": hasta})
+    return cursor_pg.rowcount
+
+
+# Primera y última lectura de las tablas anteriores, o None si están vacías
+def rango_tablas_anteriores(cursor_pg, tabla_temperatura, tabla_humedad):
+    cursor_pg.execute(f"""
+        SELECT MIN(minimo), MAX(maximo) FROM (
+            SELECT MIN(timestamp) AS minimo, MAX(timestamp) AS maximo FROM {tabla_temperatura}
+            UNION ALL
+            SELECT MIN(timestamp), MAX(timestamp) FROM {tabla_humedad}
+        ) rangos;
+    """)
+    minimo, maximo = cursor_pg.fetchone()
+    return None if minimo is None else (minimo, maximo)
+
+
+# Resumen por hora y entidad, mantenido por el loader; lo leen predictionjob y el dashboard
+def crear_tabla_rollup(cursor_pg, tabla_rollup):
+    cursor_pg.execute(f"""
+        CREATE TABLE IF NOT EXISTS {tabla_rollup} (
+            hour TIMESTAMP NOT NULL,
+            entity_id TEXT NOT NULL,
+            temp_avg DOUBLE PRECISION,
+            temp_min DOUBLE PRECISION,
+            temp_max DOUBLE PRECISION,
+            temp_count BIGINT NOT NULL DEFAULT 0,
+            hum_avg DOUBLE PRECISION,
+            hum_min DOUBLE PRECISION,
+            hum_max DOUBLE PRECISION,
+            hum_count BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (entity_id, hour)
+        );
+    """)
+    # Hora de la última escritura de cada fila (NULL en las filas anteriores a la columna): el archivo vuelve a
+    # escribir los días cuyas horas cambiaron después de archivarse
+    cursor_pg.execute(f"ALTER TABLE {tabla_rollup} ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;")
+    cursor_pg.execute(f"CREATE INDEX IF NOT EXISTS {tabla_rollup}_updated_at ON {tabla_rollup} (updated_at);")
@@ -0,0 +1,5 @@
+#!/bin/bash
+# databaseloadjob/script_streaming.sh
+
+# Ejecuta la ingesta continua (alternativa al cron horario)
+python /app/app.py --streaming
@@ -0,0 +1,59 @@
+"""Sincronización de una entidad de CrateDB a PostgreSQL: extracción paginada desde su checkpoint, carga,
+resumen por hora y checkpoint, confirmados página por página. La usan app.py y el benchmark."""
+import time
+from datetime import datetime
+
+from checkpoint import checkpoint_inicial, guardar_checkpoint, leer_checkpoint
+from extractor import extraer_paginas
+from instrumentation import tramo
+from loader import cargar, reportar_rendimiento
+from rollup import actualizar_rollup
+
+
+# Extracción y carga completa de una entidad, con su propia marca de agua. conectar_postgres y conectar_crate
+# abren una conexión nueva (cada entidad corre en su propio hilo); devuelve las filas cargadas y la duración
+def sincronizar_entidad(conectar_postgres, conectar_crate, entidad, tabla_lecturas, tabla_rollup, modo_carga, tam_pagina):
+    postgres_conn = cursor_pg = crate_conn = cursor_crate = None
+    try:
+        with tramo("connect", destino="postgres"):
+            postgres_conn = conectar_postgres()
+        cursor_pg = postgres_conn.cursor()
+
+        desde_ms = leer_checkpoint(cursor_pg, entidad)
+        if desde_ms is None:
+            # Primera ejecución: se parte de lo que ya está cargado en PostgreSQL
+            desde_ms = checkpoint_inicial(cursor_pg, entidad, tabla_lecturas)
+        postgres_conn.commit()
+        print(f"[{entidad}] Sincronizando desde time_index > {desde_ms}")
+
+        with tramo("connect", destino="crate"):
+            crate_conn = conectar_crate()
+        cursor_crate = crate_conn.cursor()
+
+        # Cada página se inserta y se confirma junto con su checkpoint antes de pedir la siguiente
+        total_filas = 0
+        inicio = time.perf_counter()
+        for pagina in extraer_paginas(cursor_crate, entidad, desde_ms, tam_pagina):
+            n_filas, duracion = cargar(cursor_pg, pagina, entidad, tabla_lecturas, modo=modo_carga)
+            # Las páginas vienen ordenadas por time_index: solo se recalculan las horas entre la primera y la última lectura
+            actualizar_rollup(cursor_pg, entidad,
+                              datetime.fromtimestamp(pagina[0][0] / 1000.0), datetime.fromtimestamp(pagina[-1][0] / 1000.0),
+                              tabla_lecturas, tabla_rollup)
+            with tramo("commit"):
+                guardar_checkpoint(cursor_pg, entidad, pagina[-1][0])
+                # Guardar los cambios definitivamente
+                postgres_conn.commit()
+            total_filas += n_filas
+            reportar_rendimiento(f"{modo_carga} [{entidad}]", n_filas, duracion)
+
+        return total_filas, time.perf_counter() - inicio
+
+    finally:
+        if cursor_crate:
+            cursor_crate.close()
+        if crate_conn:
+            crate_conn.close()
+        if cursor_pg:
+            cursor_pg.close()
+        if postgres_conn:
+            postgres_conn.close()
@@ -1,11 +1,14 @@
 import psycopg2
+import os
 import sys
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-from sklearn import metrics
-from sklearn.ensemble import RandomForestRegressor
-from skforecast.ForecasterAutoreg import ForecasterAutoreg
+from datetime import datetime
+
+# Módulos compartidos entre aplicaciones (shared/); en las imágenes de Docker se copian junto a la aplicación
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "shared"))
+
+from instrumentation import configurar, tramo
+from pipeline import completar_entidades, leer_historia, predecir_entidades
+from publisher import agregar_columnas_metricas, crear_tablas_publicacion, publicar_predicciones
 
 # PostgreSQL
 POSTGRES_HOST = "localhost"
@@ -13,35 +16,75 @@ POSTGRES_PORT = "5432"
 POSTGRES_DB = "postgres"
 POSTGRES_USER = "root"
 POSTGRES_PASSWORD = "password"
-POSTGRES_TABLE_TEMPERATURE = "temperature_dummy"
-POSTGRES_TABLE_HUMIDITY = "humidity_dummy"
+# Resumen por hora que mantiene databaseloadjob
+POSTGRES_TABLE_HOURLY = "hourly_readings"
+# Entidades a predecir (None = todas las que tienen datos en el resumen por hora)
+ENTITY_IDS = None
+# Predicciones de todas las corridas; la corrida vigente la indica POSTGRES_TABLE_PREDICTION_CURRENT y el
+# dashboard lee la vista POSTGRES_VIEW_PREDICTION_CURRENT
 POSTGRES_TABLE_PREDICTION = "predictions"
+POSTGRES_TABLE_PREDICTION_RUNS = "prediction_runs"
+POSTGRES_TABLE_PREDICTION_CURRENT = "prediction_current"
+POSTGRES_VIEW_PREDICTION_CURRENT = "current_predictions"
 POSTGRES_TABLE_MODEL_ACCURACY = "model_accuracy"
 
-try:
-    # Conexión a PostgreSQL
-    postgres_conn = psycopg2.connect(
-        host=POSTGRES_HOST,
-        port=POSTGRES_PORT,
-        database=POSTGRES_DB,
-        user=POSTGRES_USER,
-        password=POSTGRES_PASSWORD
-    )
-    cursor_pg = postgres_conn.cursor()
+# Archivo en Parquet de los días cerrados del resumen por hora, que escribe databaseloadjob (None = leer todo
+# de PostgreSQL)
+ARCHIVO_DIR = "/data/archivo/hourly"
+
+# Ventana de entrenamiento: máximo de lags y de historia usados por ambos modelos,
+# así el tiempo de entrenamiento no crece a medida que se acumulan datos
+MAX_LAGS = 24
+MAX_HISTORIA_DIAS = 90
 
-    # Datos de temperatura y humedad
-    query_humidity = f"SELECT date_trunc('hour', timestamp) AS hour_interval, AVG(value) AS avg_value FROM {POSTGRES_TABLE_HUMIDITY} GROUP BY hour_interval ORDER BY hour_interval;"
+# Directorio donde se guardan los modelos entrenados; si los datos no cambian no se reentrena
+MODEL_CACHE_DIR = "/app/modelos"
 
-    query_temperature = f"SELECT date_trunc('hour', timestamp) AS hour_interval, AVG(value) AS avg_value FROM {POSTGRES_TABLE_TEMPERATURE} GROUP BY hour_interval ORDER BY hour_interval;"
+# Relleno de horas sin datos: "linear" o "ffill"; con MAX_HUECO_HORAS los huecos más largos no se interpolan
+# (quedan cubiertos solo por el relleno de bordes)
+POLITICA_HUECOS = "linear"
+MAX_HUECO_HORAS = None
 
-    cursor_pg.execute(query_humidity)
-    humedad = cursor_pg.fetchall()
+# Núcleos disponibles para entrenar (None = todos) y máximo de series entrenadas a la vez (None = todas)
+PRESUPUESTO_CPU = None
+MAX_PROCESOS = None
 
-    cursor_pg.execute(query_temperature)
-    temperatura = cursor_pg.fetchall()
+# Modelos candidatos de model_registry, del más liviano al más costoso (None = todos), y segundos de cada corrida
+# para evaluarlos en todas las series; se elige el de menor MAE entre los que terminaron dentro del presupuesto
+MODELOS_CANDIDATOS = None
+PRESUPUESTO_SELECCION_S = 60
+
+# "por_serie": un modelo por cada serie (entidad y variable); "global": un solo modelo para todas las series
+MODO_MODELO = "por_serie"
+
+# Métricas de las etapas al terminar la corrida: directorio del textfile collector de node_exporter y URL del
+# Pushgateway (None desactiva cada destino; el resumen siempre se imprime en el log)
+METRICAS_TEXTFILE_DIR = None
+PUSHGATEWAY_URL = None
+
+VARIABLES = {"temperature": "Temperatura", "humidity": "Humedad"}
+
+metricas_etapas = configurar("predictionjob")
+postgres_conn = cursor_pg = None
+
+try:
+    # Conexión a PostgreSQL
+    with tramo("connect", destino="postgres"):
+        postgres_conn = psycopg2.connect(
+            host=POSTGRES_HOST,
+            port=POSTGRES_PORT,
+            database=POSTGRES_DB,
+            user=POSTGRES_USER,
+            password=POSTGRES_PASSWORD
+        )
+    cursor_pg = postgres_conn.cursor()
+
+    # Historia por hora: días cerrados del archivo y, de PostgreSQL, solo lo posterior al último día archivado
+    df_lecturas = leer_historia(cursor_pg, POSTGRES_TABLE_HOURLY, ENTITY_IDS, MAX_HISTORIA_DIAS, ARCHIVO_DIR)
 
 except Exception as e:
     print(f"Ha ocurrido un error: {e}")
+    metricas_etapas.exportar(METRICAS_TEXTFILE_DIR, PUSHGATEWAY_URL)
     sys.exit(1)
 
 finally:
@@ -62,243 +105,90 @@ finally:
 
 # --- Preprocesamiento de datos ---
 
+# Por cada entidad, temperatura y humedad se completan juntas sobre una única rejilla horaria continua
+df_completos = completar_entidades(df_lecturas, list(VARIABLES), MAX_HISTORIA_DIAS, POLITICA_HUECOS, MAX_HUECO_HORAS)
+print(f"Entidades a predecir: {len(df_completos)}")
 
 
+# --- Entrenamiento y predicción ---
 
-
-
-
-# --- Temperatura ---
-
-df_temperatura = pd.DataFrame(temperatura, columns=["hour", "temperature"])
-
-# Crear una columna de 'fecha' para agrupar por día
-df_temperatura['fecha'] = df_temperatura['hour'].dt.date
-
-# Crear un rango de horas completo para cada día que esté presente en los datos
-fechas_unicas = df_temperatura['fecha'].unique()
-
-# Crear un DataFrame vacío para almacenar todas las fechas y horas
-rango_completo = []
-for fecha in fechas_unicas:
-    horas = pd.date_range(start=pd.to_datetime(fecha), periods=24, freq='h')
-    rango_completo.append(pd.DataFrame({'hour': horas}))
-
-# Concatenar todos los DataFrames de rangos de horas en un solo DataFrame
-rango_completo_df = pd.concat(rango_completo, ignore_index=True)
-
-# Hacer un merge (unir) entre el DataFrame completo de horas y el DataFrame de temperatura
-# Esto permitirá identificar las horas que no tienen registros de temperatura
-df_completo_temp = pd.merge(rango_completo_df, df_temperatura, on="hour", how="left")
-
-df_completo_temp = df_completo_temp.drop(columns=["fecha"])
-
-# Realizar la interpolación lineal para rellenar los valores faltantes de temperatura
-df_completo_temp['temperature'] = df_completo_temp['temperature'].interpolate(method='linear')
-
-# Si quedan valores nulos al principio o al final, se pueden rellenar con ffill o bfill
-df_completo_temp['temperature'] = df_completo_temp['temperature'].ffill().bfill()
-
-
-# --- División de datos en entrenamiento y prueba ---
-
-# Dividir el 70% de los datos para entrenamiento y el 30% para prueba
-split_index = int(0.7 * len(df_completo_temp))
-train_data = df_completo_temp['temperature'][:split_index]
-test_data = df_completo_temp['temperature'][split_index:]
-
-
-# --- Predicción de valores futuros con Skforecast ---
-
-# Crear y entrenar el modelo ForecasterAutoreg con RandomForestRegressor
-# Ajustar el valor de lags para que sea menor que el tamaño de la serie
-total_observations = len(train_data)
-
-# Los lags, representan, la cantidad de valores pasados de la serie que se van a utilizar para predecir el siguiente valor. En este caso se tiene como minimo 24 (debe haber un día de datos) y máximo el total de observaciones menos 1
-lags = max(24, total_observations - 1)  
-
-forecaster = ForecasterAutoreg(
-                regressor=RandomForestRegressor(random_state=123),
-                lags=lags
-             )
-
-# Entrenar el modelo con datos de prueba
-forecaster.fit(y=train_data)
-
-# --- Evaluación del modelo en el conjunto de prueba ---
-
-# Realizar predicciones en el conjunto de prueba (tantos pasos como el tamaño del conjunto de prueba)
-steps = len(test_data)
-predictions = forecaster.predict(steps=steps)
-
-# Calcular métricas de error
-mae_temp = metrics.mean_absolute_error(test_data, predictions)
-mse_temp = np.mean((test_data - predictions) ** 2)  # MSE calculado manualmente
-rmse_temp = np.sqrt(mse_temp)
-mape_temp = np.mean(np.abs((test_data - predictions) / test_data)) * 100
-
-
-# --- Predicción futura ---
-
-
-# Se reentrena al modelo incluyendo los últimos datos de humedad
-forecaster.fit(y=df_completo_temp['temperature'])
-
-# Definir el número de pasos para predecir
-steps = 24
-
-# Realizar predicciones con el modelo entrenado
-predictions = forecaster.predict(steps=steps)
-
-# Mostrar las predicciones futuras
-ultima_hora = df_completo_temp['hour'].max()
-horas_futuras = pd.date_range(start=ultima_hora + timedelta(hours=1), periods=steps, freq='h')
-df_futuro_temp = pd.DataFrame({'hour': horas_futuras, 'predicted_temperature': predictions})
-print(df_futuro_temp)
-
-
-print("Fin del modelo de temperatura")
-
-
-
-
-
-
-
-
-# --- Humedad ---
-
-df_humedad = pd.DataFrame(humedad, columns=["hour", "humidity"])
-
-# Crear una columna de 'fecha' para agrupar por día
-df_humedad['fecha'] = df_humedad['hour'].dt.date
-
-# Crear un rango de horas completo para cada día que esté presente en los datos
-fechas_unicas = df_humedad['fecha'].unique()
-
-# Crear un DataFrame vacío para almacenar todas las fechas y horas
-rango_completo = []
-for fecha in fechas_unicas:
-    horas = pd.date_range(start=pd.to_datetime(fecha), periods=24, freq='h')
-    rango_completo.append(pd.DataFrame({'hour': horas}))
-
-# Concatenar todos los DataFrames de rangos de horas en un solo DataFrame
-rango_completo_df = pd.concat(rango_completo, ignore_index=True)
-
-# Hacer un merge (unir) entre el DataFrame completo de horas y el DataFrame de humedad
-# Esto permitirá identificar las horas que no tienen registros de humedad
-df_completo_hum = pd.merge(rango_completo_df, df_humedad, on="hour", how="left")
-
-df_completo_hum = df_completo_hum.drop(columns=["fecha"])
-
-# Realizar la interpolación lineal para rellenar los valores faltantes de humedad
-df_completo_hum['humidity'] = df_completo_hum['humidity'].interpolate(method='linear')
-
-# Si quedan valores nulos al principio o al final, se pueden rellenar con ffill o bfill
-df_completo_hum['humidity'] = df_completo_hum['humidity'].ffill().bfill()
-
-
-
-# --- División de datos en entrenamiento y prueba ---
-
-# Dividir el 70% de los datos para entrenamiento y el 30% para prueba
-split_index = int(0.7 * len(df_completo_hum))
-train_data = df_completo_hum['humidity'][:split_index]
-test_data = df_completo_hum['humidity'][split_index:]
-
-
-# --- Predicción de valores futuros con Skforecast ---
-
-# Crear y entrenar el modelo ForecasterAutoreg con RandomForestRegressor
-# Ajustar el valor de lags para que sea menor que el tamaño de la serie
-total_observations = len(train_data)
-lags = min(24, total_observations - 1)  # Ajustar el valor de lags para que no supere el número de observaciones
-
-forecaster = ForecasterAutoreg(
-                regressor=RandomForestRegressor(random_state=123),
-                lags=lags
-             )
-
-
-forecaster.fit(y=train_data)
-
-# --- Evaluación del modelo en el conjunto de prueba ---
-
-# Realizar predicciones en el conjunto de prueba (tantos pasos como el tamaño del conjunto de prueba)
-steps = len(test_data)
-predictions = forecaster.predict(steps=steps)
-
-# Calcular métricas de error
-mae_hum = metrics.mean_absolute_error(test_data, predictions)
-mse_hum = np.mean((test_data - predictions) ** 2)  # MSE calculado manualmente
-rmse_hum = np.sqrt(mse_temp)
-mape_hum = np.mean(np.abs((test_data - predictions) / test_data)) * 100
-
-
-
-
-# --- Predicción futura ---
-
-# Se reentrena al modelo incluyendo los últimos datos de humedad
-forecaster.fit(y=df_completo_hum['humidity'])
-
-# Definir el número de pasos para predecir
-steps = 24
-
-# Realizar predicciones con el modelo entrenado
-predictions = forecaster.predict(steps=steps)
-
-# Mostrar las predicciones futuras
-ultima_hora = df_completo_hum['hour'].max()
-horas_futuras = pd.date_range(start=ultima_hora + timedelta(hours=1), periods=steps, freq='h')
-df_futuro_hum = pd.DataFrame({'hour': horas_futuras, 'predicted_humidity': predictions})
-print(df_futuro_hum)
-
-print("Fin del modelo de temperatura")
-
-
-df_futuro_completo = pd.merge(df_futuro_temp, df_futuro_hum, on="hour", how="inner")
+# Por serie (cada una en su propio proceso) o un solo modelo global; una fila por entidad y hora con la
+# temperatura y la humedad predichas
+resultados, df_futuro_completo = predecir_entidades(
+    df_completos, list(VARIABLES), MODO_MODELO, MAX_LAGS, MODEL_CACHE_DIR, PRESUPUESTO_CPU, MAX_PROCESOS,
+    MODELOS_CANDIDATOS, PRESUPUESTO_SELECCION_S
+)
 
 print(df_futuro_completo)
 
+postgres_conn = cursor_pg = None
+
 try:
 
-    postgres_conn = psycopg2.connect(
-        host=POSTGRES_HOST,
-        port=POSTGRES_PORT,
-        database=POSTGRES_DB,
-        user=POSTGRES_USER,
-        password=POSTGRES_PASSWORD
-    )
+    with tramo("connect", destino="postgres"):
+        postgres_conn = psycopg2.connect(
+            host=POSTGRES_HOST,
+            port=POSTGRES_PORT,
+            database=POSTGRES_DB,
+            user=POSTGRES_USER,
+            password=POSTGRES_PASSWORD
+        )
     
     cursor_pg = postgres_conn.cursor()
 
-    # Cada vez que se hace una predicción se limpiar la tabla de predicciones
-    truncate_query = f"TRUNCATE TABLE {POSTGRES_TABLE_PREDICTION};"
-    cursor_pg.execute(truncate_query)
-
-
-    for _, row in df_futuro_completo.iterrows():
-        time_index = row['hour']
-        temp = row['predicted_temperature']
-        hum = row['predicted_humidity']
-
-        insert_temp_query = f"INSERT INTO {POSTGRES_TABLE_PREDICTION} (temperature, humidity, timestamp) VALUES (%s,%s,%s)"
-        cursor_pg.execute(insert_temp_query, (temp, hum, time_index))
-
-
-    model_accuracy_temp_query = f"INSERT INTO {POSTGRES_TABLE_MODEL_ACCURACY} (model, mae, mape, mse, rmse, timestamp) VALUES (%s,%s,%s,%s,%s,%s)"
-
-    cursor_pg.execute(model_accuracy_temp_query, ("Temperatura : RandomForestRegressor", mae_temp, mape_temp, mse_temp, rmse_temp, datetime.now()))
-
-    model_accuracy_hum_query = f"INSERT INTO {POSTGRES_TABLE_MODEL_ACCURACY} (model, mae, mape, mse, rmse, timestamp) VALUES (%s,%s,%s,%s,%s,%s)"
-
-    cursor_pg.execute(model_accuracy_hum_query, ("Humedad : RandomForestRegressor", mae_hum, mape_hum, mse_hum, rmse_hum, datetime.now()))
-
-    # Guardar los cambios definitivamente
-    
+    # Los cambios de esquema van en su propia transacción para no retener sus bloqueos durante la carga; solo se
+    # ejecutan cuando falta algún objeto o columna (la primera corrida o tras actualizar la aplicación)
+    creado = crear_tablas_publicacion(
+        cursor_pg, POSTGRES_TABLE_PREDICTION, POSTGRES_TABLE_PREDICTION_RUNS,
+        POSTGRES_TABLE_PREDICTION_CURRENT, POSTGRES_VIEW_PREDICTION_CURRENT
+    )
+    if agregar_columnas_metricas(cursor_pg, POSTGRES_TABLE_MODEL_ACCURACY) or creado:
+        print("Esquema de publicación actualizado")
     postgres_conn.commit()
 
+    # Publicación: la corrida, sus predicciones y las métricas de los modelos, hasta el commit
+    with tramo("publish"):
+        # La nueva corrida se carga con COPY y se publica moviendo el puntero; las corridas anteriores se conservan
+        run_id = publicar_predicciones(
+            cursor_pg, df_futuro_completo, POSTGRES_TABLE_PREDICTION, POSTGRES_TABLE_PREDICTION_RUNS,
+            POSTGRES_TABLE_PREDICTION_CURRENT, MODO_MODELO
+        )
+        print(f"Corrida {run_id}: {len(df_futuro_completo)} predicciones")
+
+        model_accuracy_query = f"INSERT INTO {POSTGRES_TABLE_MODEL_ACCURACY} (run_id, entity_id, model, mae, mape, mse, rmse, lags, history_hours, cache_hit, time_saved_s, eval_time_s, fit_time_s, predict_time_s, model_size_bytes, selected, timestamp) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)"
+        model_accuracy_candidate_query = f"INSERT INTO {POSTGRES_TABLE_MODEL_ACCURACY} (run_id, entity_id, model, mae, mape, mse, rmse, lags, history_hours, eval_time_s, fit_time_s, predict_time_s, model_size_bytes, selected, timestamp) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)"
+        model_accuracy_fold_query = f"INSERT INTO {POSTGRES_TABLE_MODEL_ACCURACY} (run_id, entity_id, model, mae, mape, mse, rmse, lags, fold, timestamp) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)"
+
+        sufijo_modelo = " (global)" if MODO_MODELO == "global" else ""
+        for (entidad, columna), resultado in resultados.items():
+            metricas = resultado["metricas"]
+            modelo = f"{VARIABLES[columna]} : {metricas['modelo']}{sufijo_modelo}"
+            # Modelo elegido: promedio de los folds
+            cursor_pg.execute(model_accuracy_query, (
+                run_id, entidad, modelo, metricas["mae"], metricas["mape"], metricas["mse"], metricas["rmse"],
+                resultado["lags"], resultado["historia"], resultado["cache_hit"], resultado["tiempo_ahorrado"],
+                metricas["tiempo_evaluacion"], metricas["tiempo_fit"], metricas["tiempo_prediccion"],
+                metricas["tamano_bytes"], True, datetime.now()
+            ))
+            # Cada candidato y cada fold por separado, solo cuando la evaluación se ejecutó en esta corrida
+            if not resultado["cache_hit"]:
+                for candidato in metricas["candidatos"]:
+                    if candidato["modelo"] == metricas["modelo"]:
+                        continue
+                    cursor_pg.execute(model_accuracy_candidate_query, (
+                        run_id, entidad, f"{VARIABLES[columna]} : {candidato['modelo']}", candidato["mae"], candidato["mape"],
+                        candidato["mse"], candidato["rmse"], resultado["lags"], resultado["historia"],
+                        candidato["tiempo_evaluacion"], candidato["tiempo_fit"], candidato["tiempo_prediccion"],
+                        candidato["tamano_bytes"], False, datetime.now()
+                    ))
+                for fold in metricas["folds"]:
+                    cursor_pg.execute(model_accuracy_fold_query, (
+                        run_id, entidad, modelo, fold["mae"], fold["mape"], fold["mse"], fold["rmse"], resultado["lags"], fold["fold"], datetime.now()
+                    ))
+
+        # Guardar los cambios definitivamente: la corrida queda publicada junto con sus métricas
+        postgres_conn.commit()
+
 
 except Exception as e:
     print(f"Ha ocurrido un error: {e}")
@@ -309,4 +199,5 @@ finally:
         cursor_pg.close()
     if postgres_conn:
         postgres_conn.close()
-    print("Conexiones cerradas.")
\ No newline at end of file
+    print("Conexiones cerradas.")
+    metricas_etapas.exportar(METRICAS_TEXTFILE_DIR, PUSHGATEWAY_URL)
\ No newline at end of file
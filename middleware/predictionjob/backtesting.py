@@ -0,0 +1,75 @@
+"""Evaluación con origen móvil (rolling origin).
+
+La matriz de lags de la serie se construye una sola vez; cada fold entrena con las primeras filas
+de esa matriz (todas las observaciones anteriores al origen) y predice el horizonte real de 24 horas
+de forma recursiva, igual que ForecasterAutoreg.
+"""
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# Fila i: los lags valores anteriores a la posición i + lags (lag_1 primero); objetivo: valores[i + lags]
+def matriz_lags(valores, lags):
+    X = sliding_window_view(valores[:-1], lags)[:, ::-1]
+    y = valores[lags:]
+    return np.ascontiguousarray(X), y
+
+
+# Predicción recursiva: cada valor predicho pasa a ser el lag_1 del paso siguiente
+def predecir_recursivo(regresor, ventana, pasos):
+    lags = len(ventana)
+    buffer = np.empty(lags + pasos)
+    buffer[:lags] = ventana
+    for paso in range(pasos):
+        x = buffer[paso:paso + lags][::-1].reshape(1, -1)
+        buffer[lags + paso] = regresor.predict(x)[0]
+    return buffer[lags:]
+
+
+# Orígenes de los folds: los últimos n_folds bloques de horizonte horas que dejan al menos min_entrenamiento filas
+def origenes(n_observaciones, lags, horizonte, n_folds, min_entrenamiento):
+    candidatos = [n_observaciones - horizonte * k for k in range(n_folds, 0, -1)]
+    return [origen for origen in candidatos if origen - lags >= min_entrenamiento]
+
+
+def metricas_error(reales, predicciones):
+    errores = reales - predicciones
+    mse = float(np.mean(errores ** 2))
+    return {
+        "mae": float(np.mean(np.abs(errores))),
+        "mse": mse,
+        "rmse": float(np.sqrt(mse)),
+        "mape": float(np.mean(np.abs(errores / reales)) * 100),
+    }
+
+
+# Devuelve las métricas de cada fold (con su tiempo de entrenamiento y de predicción), el tiempo total de la
+# evaluación y el regresor del último fold. matriz: (X, y) de matriz_lags ya construida para valores y lags, para
+# compartirla entre los candidatos de una misma serie
+def backtesting(valores, lags, crear_regresor, horizonte=24, n_folds=5, min_entrenamiento=None, matriz=None):
+    inicio = time.perf_counter()
+    valores = np.asarray(valores, dtype=np.float64)
+    X, y = matriz if matriz is not None else matriz_lags(valores, lags)
+    if min_entrenamiento is None:
+        min_entrenamiento = lags + 1
+
+    folds = []
+    regresor = None
+    for numero, origen in enumerate(origenes(len(valores), lags, horizonte, n_folds, min_entrenamiento), start=1):
+        filas = origen - lags
+        regresor = crear_regresor()
+        inicio_fit = time.perf_counter()
+        regresor.fit(X[:filas], y[:filas])
+        inicio_prediccion = time.perf_counter()
+        predicciones = predecir_recursivo(regresor, valores[origen - lags:origen], horizonte)
+        fin_prediccion = time.perf_counter()
+        fold = metricas_error(valores[origen:origen + horizonte], predicciones)
+        fold["fold"] = numero
+        fold["entrenamiento"] = filas
+        fold["tiempo_fit"] = inicio_prediccion - inicio_fit
+        fold["tiempo_prediccion"] = fin_prediccion - inicio_prediccion
+        folds.append(fold)
+
+    return folds, time.perf_counter() - inicio, regresor
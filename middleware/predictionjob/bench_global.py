@@ -0,0 +1,86 @@
+"""Compara el tiempo de entrenamiento y predicción de un modelo por serie frente al modelo global
+a medida que crece el número de entidades (cada entidad aporta una serie de temperatura y una de humedad).
+
+Ejemplo: python bench_global.py --entidades 1 2 4 8 16 --dias 30
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Módulos compartidos entre aplicaciones (shared/); en las imágenes de Docker se copian junto a la aplicación
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "shared"))
+
+from forecasting import MODELO_GLOBAL, PASOS_PREDICCION, crear_forecaster
+from model_registry import crear_regresor
+from global_forecaster import ForecasterGlobal
+
+
+# Series horarias sintéticas con ciclo diario y ruido, distintas por entidad
+def generar_series(n_entidades, dias, semilla=123):
+    rng = np.random.default_rng(semilla)
+    t = np.arange(dias * 24)
+    series = {}
+    for i in range(n_entidades):
+        fase = rng.uniform(0, 2 * np.pi)
+        series[f"nodo{i:03d}_temperature"] = 20 + 5 * np.sin(2 * np.pi * t / 24 + fase) + rng.normal(0, 0.5, len(t))
+        series[f"nodo{i:03d}_humidity"] = 60 - 10 * np.sin(2 * np.pi * t / 24 + fase) + rng.normal(0, 1.5, len(t))
+    return series
+
+
+def medir_por_serie(series, lags, n_jobs):
+    inicio = time.perf_counter()
+    forecasters = {}
+    for nombre, valores in series.items():
+        forecasters[nombre] = crear_forecaster(lags, n_jobs)
+        forecasters[nombre].fit(y=pd.Series(valores))
+    entrenamiento = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for forecaster in forecasters.values():
+        forecaster.predict(steps=PASOS_PREDICCION)
+    prediccion = time.perf_counter() - inicio
+    return entrenamiento, prediccion
+
+
+def medir_global(series, lags, n_jobs):
+    inicio = time.perf_counter()
+    forecaster = ForecasterGlobal(crear_regresor(MODELO_GLOBAL, n_jobs), lags).fit(series)
+    entrenamiento = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    forecaster.predict(PASOS_PREDICCION)
+    prediccion = time.perf_counter() - inicio
+    return entrenamiento, prediccion
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark: modelo por serie vs modelo global")
+    parser.add_argument("--entidades", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--lags", type=int, default=24)
+    parser.add_argument("--n-jobs", type=int, default=1)
+    parser.add_argument("--json", help="Archivo donde guardar los resultados")
+    args = parser.parse_args()
+
+    resultados = []
+    print(f"{'entidades':>9} {'series':>6} | {'por serie fit':>13} {'predict':>8} | {'global fit':>10} {'predict':>8}")
+    for n_entidades in args.entidades:
+        series = generar_series(n_entidades, args.dias)
+        fit_serie, pred_serie = medir_por_serie(series, args.lags, args.n_jobs)
+        fit_global, pred_global = medir_global(series, args.lags, args.n_jobs)
+        resultados.append({
+            "entidades": n_entidades,
+            "series": len(series),
+            "por_serie": {"fit_s": fit_serie, "predict_s": pred_serie},
+            "global": {"fit_s": fit_global, "predict_s": pred_global},
+        })
+        print(f"{n_entidades:>9} {len(series):>6} | {fit_serie:>12.2f}s {pred_serie:>7.2f}s | {fit_global:>9.2f}s {pred_global:>7.2f}s")
+
+    if args.json:
+        with open(args.json, "w") as archivo:
+            json.dump(resultados, archivo, indent=2)
@@ -0,0 +1,206 @@
+import multiprocessing
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import sklearn
+import skforecast
+from skforecast.ForecasterAutoreg import ForecasterAutoreg
+
+from backtesting import backtesting, matriz_lags
+from global_forecaster import ejecutar_global
+from instrumentation import registrar
+from model_cache import cargar_modelo, guardar_modelo, huella
+from model_registry import CANDIDATOS, RANDOM_STATE, crear_regresor, parametros_candidato
+
+# Horas a predecir (también es el horizonte de cada fold de la evaluación)
+PASOS_PREDICCION = 24
+# Folds de la evaluación con origen móvil: los últimos N_FOLDS días de la serie
+N_FOLDS = 5
+# Modelo del modo global
+MODELO_GLOBAL = "RandomForestRegressor"
+
+
+# Lags: la cantidad de valores pasados de la serie que se usan para predecir el siguiente, limitada por max_lags
+# y por el tamaño de la serie (debe quedar al menos una observación para entrenar)
+def calcular_lags(total_observations, max_lags):
+    return max(1, min(max_lags, total_observations - 1))
+
+
+def crear_forecaster(lags, n_jobs=1, modelo=MODELO_GLOBAL):
+    return ForecasterAutoreg(
+        regressor=crear_regresor(modelo, n_jobs),
+        lags=lags
+    )
+
+
+# Evalúa un candidato con origen móvil: promedio de los folds, tiempos medios de entrenamiento y de predicción
+# de 24 horas y tamaño serializado del modelo. matriz: (X, y) de matriz_lags de la serie (None = se construye)
+def evaluar_candidato(modelo, valores, lags, n_jobs=1, matriz=None):
+    folds, tiempo_evaluacion, regresor = backtesting(
+        valores, lags, lambda: crear_regresor(modelo, n_jobs),
+        horizonte=PASOS_PREDICCION, n_folds=N_FOLDS, matriz=matriz
+    )
+    resumen = {
+        clave: float(np.mean([fold[clave] for fold in folds])) if folds else float("nan")
+        for clave in ("mae", "mse", "rmse", "mape", "tiempo_fit", "tiempo_prediccion")
+    }
+    resumen["modelo"] = modelo
+    resumen["tamano_bytes"] = len(pickle.dumps(regresor)) if regresor is not None else None
+    resumen["folds"] = folds
+    resumen["tiempo_evaluacion"] = tiempo_evaluacion
+    return resumen
+
+
+# Evalúa los candidatos en orden hasta el límite (time.time() en el que se acaba el presupuesto de la corrida) y
+# elige el de menor MAE. El primer candidato se evalúa siempre; los demás no empiezan si ya se pasó el límite y
+# se descartan si su evaluación termina después, así nunca se elige un candidato que no cupo en el presupuesto.
+# La matriz de lags depende solo de la serie y de los lags: se construye una vez para todos los candidatos
+def seleccionar_modelo(valores, lags, candidatos, limite=None, n_jobs=1):
+    matriz = matriz_lags(valores, lags)
+    evaluados = []
+    for modelo in candidatos:
+        if evaluados and limite is not None and time.time() >= limite:
+            print(f"Sin presupuesto para evaluar {modelo}")
+            continue
+        resumen = evaluar_candidato(modelo, valores, lags, n_jobs, matriz)
+        if evaluados and limite is not None and time.time() > limite:
+            print(f"Se descarta {modelo}: su evaluación ({resumen['tiempo_evaluacion']:.2f} s) terminó "
+                  f"{time.time() - limite:.2f} s después del límite")
+            continue
+        evaluados.append(resumen)
+    elegido = min(evaluados, key=lambda resumen: resumen["mae"] if np.isfinite(resumen["mae"]) else np.inf)
+    return elegido, evaluados
+
+
+# Selección del modelo con origen móvil y reentrenamiento del elegido con la serie completa
+def entrenar_serie(serie, lags, n_jobs=1, candidatos=None, limite=None):
+    # --- Evaluación de los candidatos: un fold por cada uno de los últimos N_FOLDS días ---
+    elegido, evaluados = seleccionar_modelo(
+        serie.to_numpy(dtype=np.float64), lags, candidatos or list(CANDIDATOS), limite, n_jobs
+    )
+    metricas = dict(elegido)
+    # Resumen de todos los candidatos evaluados, sin el detalle por fold
+    metricas["candidatos"] = [
+        {clave: valor for clave, valor in resumen.items() if clave != "folds"} for resumen in evaluados
+    ]
+
+    # Se reentrena al modelo elegido incluyendo los últimos datos
+    forecaster = crear_forecaster(lags, n_jobs, elegido["modelo"])
+    forecaster.fit(y=serie)
+    return forecaster, metricas
+
+
+# Pipeline completo de una serie: usa el modelo guardado si los datos y los hiperparámetros no cambiaron.
+# presupuesto: segundos de selección de la corrida (forma parte de la huella); limite: cuándo se acaban
+def ejecutar_serie(nombre, df, columna, max_lags, cache_dir, n_jobs=1, candidatos=None, presupuesto=None,
+                   limite=None):
+    serie = df[columna]
+    candidatos = candidatos or list(CANDIDATOS)
+    # Los lags se limitan por la serie sin el horizonte del último fold; con poca historia la evaluación usa
+    # menos folds (origenes() descarta los que no alcanzan) en lugar de reducir los lags
+    lags = calcular_lags(len(serie) - PASOS_PREDICCION, max_lags)
+    hiperparametros = {
+        "candidatos": candidatos,
+        "presupuesto": presupuesto,
+        "random_state": RANDOM_STATE,
+        "lags": lags,
+        "pasos": PASOS_PREDICCION,
+        "n_folds": N_FOLDS,
+        "parametros": {modelo: parametros_candidato(modelo) for modelo in candidatos},
+        "sklearn": sklearn.__version__,
+        "skforecast": skforecast.__version__,
+    }
+    huella_actual = huella(df["hour"], serie, hiperparametros)
+
+    inicio = time.perf_counter()
+    entrada = cargar_modelo(cache_dir, nombre, huella_actual)
+    if entrada is not None:
+        forecaster = entrada["forecaster"]
+        metricas = entrada["metricas"]
+        tiempo_ahorrado = entrada["tiempo_entrenamiento"]
+    else:
+        forecaster, metricas = entrenar_serie(serie, lags, n_jobs, candidatos, limite)
+        guardar_modelo(cache_dir, nombre, huella_actual, forecaster, metricas, time.perf_counter() - inicio)
+        tiempo_ahorrado = 0.0
+    tiempo_fit = time.perf_counter() - inicio
+
+    # --- Predicción futura ---
+    inicio_prediccion = time.perf_counter()
+    predictions = forecaster.predict(steps=PASOS_PREDICCION)
+    tiempo_prediccion = time.perf_counter() - inicio_prediccion
+    ultima_hora = df["hour"].max()
+    horas_futuras = pd.date_range(start=ultima_hora + timedelta(hours=1), periods=PASOS_PREDICCION, freq="h")
+    df_futuro = pd.DataFrame({"hour": horas_futuras, f"predicted_{columna}": predictions.to_numpy()})
+
+    resultado = {
+        "nombre": nombre,
+        "df_futuro": df_futuro,
+        "metricas": metricas,
+        "lags": lags,
+        "historia": len(serie),
+        "cache_hit": entrada is not None,
+        "tiempo_ahorrado": tiempo_ahorrado,
+        "tiempo_fit": tiempo_fit,
+        "tiempo_prediccion": tiempo_prediccion,
+        "duracion": time.perf_counter() - inicio,
+    }
+    estado = f"caché (ahorro {tiempo_ahorrado:.2f} s)" if resultado["cache_hit"] else "reentrenado"
+    print(f"{nombre}: {estado}, modelo={metricas['modelo']}, lags={lags}, historia={len(serie)} horas, MAE={metricas['mae']:.3f}, {resultado['duracion']:.2f} s")
+    return resultado
+
+
+# Reparte el presupuesto de CPU entre procesos (series en paralelo) y n_jobs (árboles en paralelo dentro de cada
+# modelo) para no lanzar más hilos que núcleos
+def repartir_cpu(n_series, presupuesto_cpu=None, max_procesos=None):
+    presupuesto_cpu = presupuesto_cpu or os.cpu_count() or 1
+    procesos = min(n_series, max_procesos or n_series, presupuesto_cpu)
+    procesos = max(1, procesos)
+    n_jobs = max(1, presupuesto_cpu // procesos)
+    return procesos, n_jobs
+
+
+# Ejecuta cada serie (evaluación, reentrenamiento y predicción) como tarea independiente en un pool de procesos.
+# tareas: lista de (nombre, df, columna); devuelve los resultados en el mismo orden.
+# presupuesto_seleccion: segundos de la corrida para evaluar candidatos, compartidos por todas las series
+# (None = evaluarlos todos)
+def ejecutar_series(tareas, max_lags, cache_dir, presupuesto_cpu=None, max_procesos=None,
+                    candidatos=None, presupuesto_seleccion=None):
+    procesos, n_jobs = repartir_cpu(len(tareas), presupuesto_cpu, max_procesos)
+    print(f"Entrenando {len(tareas)} series con {procesos} procesos x {n_jobs} n_jobs")
+    # Hora de reloj (no perf_counter) para que el límite valga igual en los procesos hijos
+    limite = time.time() + presupuesto_seleccion if presupuesto_seleccion is not None else None
+
+    inicio = time.perf_counter()
+    if procesos == 1:
+        resultados = [ejecutar_serie(nombre, df, columna, max_lags, cache_dir, n_jobs, candidatos,
+                                     presupuesto_seleccion, limite) for nombre, df, columna in tareas]
+    else:
+        # app.py es un script sin "if __name__ == '__main__'": con fork los procesos hijos no lo vuelven a ejecutar
+        contexto = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool:
+            futuros = [pool.submit(ejecutar_serie, nombre, df, columna, max_lags, cache_dir, n_jobs,
+                                   candidatos, presupuesto_seleccion, limite) for nombre, df, columna in tareas]
+            resultados = [futuro.result() for futuro in futuros]
+    total = time.perf_counter() - inicio
+
+    # Las series corren en otros procesos: los tiempos de cada etapa vuelven en el resultado y se registran aquí
+    for resultado in resultados:
+        print(f"Tiempo {resultado['nombre']}: {resultado['duracion']:.2f} s")
+        registrar("fit", resultado["tiempo_fit"], modo="por_serie", cache="hit" if resultado["cache_hit"] else "miss")
+        registrar("predict", resultado["tiempo_prediccion"], modo="por_serie")
+    suma = sum(resultado["duracion"] for resultado in resultados)
+    print(f"Tiempo total de entrenamiento: {total:.2f} s (suma por serie {suma:.2f} s)")
+    return resultados
+
+
+# Un solo modelo para todas las series; usa todo el presupuesto de CPU en n_jobs
+def ejecutar_series_global(tareas, max_lags, presupuesto_cpu=None):
+    n_jobs = presupuesto_cpu or os.cpu_count() or 1
+    # Los lags se limitan por la serie más corta, sin el horizonte que se deja para la evaluación
+    lags = calcular_lags(min(len(df) for _, df, _ in tareas) - PASOS_PREDICCION, max_lags)
+    return ejecutar_global(tareas, lags, lambda: crear_regresor(MODELO_GLOBAL, n_jobs), PASOS_PREDICCION)
@@ -0,0 +1,99 @@
+"""Modelo global: un solo regresor entrenado con todas las series (temperatura y humedad de cada entidad).
+
+Cada fila de entrenamiento lleva los lags de su serie más un código que identifica la serie, así el
+modelo aprende el comportamiento común y las diferencias entre nodos. La predicción es recursiva y
+en cada paso se predicen todas las series con una sola llamada a predict.
+"""
+import pickle
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from backtesting import matriz_lags, metricas_error
+from instrumentation import tramo
+
+
+class ForecasterGlobal:
+
+    def __init__(self, regresor, lags):
+        self.regresor = regresor
+        self.lags = lags
+        self.nombres = []
+        self.ultimas_ventanas = None
+
+    # series: diccionario nombre -> arreglo de valores horarios (cada una con más de lags observaciones)
+    def fit(self, series):
+        self.nombres = list(series)
+        bloques_X = []
+        bloques_y = []
+        for codigo, nombre in enumerate(self.nombres):
+            X, y = matriz_lags(np.asarray(series[nombre], dtype=np.float64), self.lags)
+            bloques_X.append(np.hstack([X, np.full((len(y), 1), codigo, dtype=np.float64)]))
+            bloques_y.append(y)
+        self.regresor.fit(np.vstack(bloques_X), np.concatenate(bloques_y))
+        self.ultimas_ventanas = np.vstack([
+            np.asarray(series[nombre], dtype=np.float64)[-self.lags:] for nombre in self.nombres
+        ])
+        return self
+
+    # Devuelve un diccionario nombre -> predicciones de los próximos pasos
+    def predict(self, pasos):
+        n_series = len(self.nombres)
+        codigos = np.arange(n_series, dtype=np.float64).reshape(-1, 1)
+        buffer = np.empty((n_series, self.lags + pasos))
+        buffer[:, :self.lags] = self.ultimas_ventanas
+        for paso in range(pasos):
+            X = np.hstack([buffer[:, paso:paso + self.lags][:, ::-1], codigos])
+            buffer[:, self.lags + paso] = self.regresor.predict(X)
+        return {nombre: buffer[i, self.lags:] for i, nombre in enumerate(self.nombres)}
+
+
+# Entrena el modelo global con todas las tareas (nombre, df, columna) y devuelve resultados con la misma forma
+# que forecasting.ejecutar_serie. La evaluación deja fuera las últimas `pasos` horas de cada serie
+def ejecutar_global(tareas, lags, crear_regresor, pasos):
+    inicio = time.perf_counter()
+    series = {nombre: df[columna].to_numpy(dtype=np.float64) for nombre, df, columna in tareas}
+
+    # --- Evaluación: mismo modelo entrenado sin el último horizonte de cada serie ---
+    inicio_evaluacion = time.perf_counter()
+    evaluacion = ForecasterGlobal(crear_regresor(), lags).fit({nombre: valores[:-pasos] for nombre, valores in series.items()})
+    inicio_prediccion = time.perf_counter()
+    predicciones_evaluacion = evaluacion.predict(pasos)
+    tiempo_prediccion = time.perf_counter() - inicio_prediccion
+    tiempo_evaluacion = time.perf_counter() - inicio_evaluacion
+    candidato = {
+        "modelo": type(evaluacion.regresor).__name__,
+        "tiempo_fit": inicio_prediccion - inicio_evaluacion,
+        "tiempo_prediccion": tiempo_prediccion,
+        "tamano_bytes": len(pickle.dumps(evaluacion.regresor)),
+    }
+
+    # --- Entrenamiento con las series completas y predicción de todas en lote ---
+    with tramo("fit", modo="global", cache="miss"):
+        forecaster = ForecasterGlobal(crear_regresor(), lags).fit(series)
+    with tramo("predict", modo="global"):
+        predicciones = forecaster.predict(pasos)
+    duracion = time.perf_counter() - inicio
+
+    resultados = []
+    for nombre, df, columna in tareas:
+        metricas = metricas_error(series[nombre][-pasos:], predicciones_evaluacion[nombre])
+        metricas.update(candidato)
+        metricas["folds"] = []
+        metricas["candidatos"] = []
+        metricas["tiempo_evaluacion"] = tiempo_evaluacion
+        horas_futuras = pd.date_range(start=df["hour"].max() + timedelta(hours=1), periods=pasos, freq="h")
+        resultados.append({
+            "nombre": nombre,
+            "df_futuro": pd.DataFrame({"hour": horas_futuras, f"predicted_{columna}": predicciones[nombre]}),
+            "metricas": metricas,
+            "lags": lags,
+            "historia": len(series[nombre]),
+            "cache_hit": False,
+            "tiempo_ahorrado": 0.0,
+            "duracion": duracion,
+        })
+    print(f"Modelo global: {len(tareas)} series, lags={lags}, {duracion:.2f} s (evaluación {tiempo_evaluacion:.2f} s)")
+    return resultados
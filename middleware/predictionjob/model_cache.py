@@ -0,0 +1,48 @@
+import hashlib
+import json
+import os
+
+import joblib
+import numpy as np
+
+
+# Huella de los datos de entrenamiento y de los hiperparámetros: si no cambia, el modelo guardado sigue siendo válido
+def huella(horas, valores, hiperparametros):
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(horas.to_numpy(dtype="datetime64[ns]")).view(np.int64).tobytes())
+    h.update(np.ascontiguousarray(valores.to_numpy(dtype=np.float64)).tobytes())
+    h.update(json.dumps(hiperparametros, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _ruta(directorio, nombre):
+    return os.path.join(directorio, f"{nombre}.joblib")
+
+
+# Devuelve la entrada guardada (forecaster, métricas, tiempo de entrenamiento) si la huella coincide, si no None
+def cargar_modelo(directorio, nombre, huella_actual):
+    ruta = _ruta(directorio, nombre)
+    if not os.path.exists(ruta):
+        return None
+    try:
+        entrada = joblib.load(ruta)
+    except Exception as e:
+        print(f"No se pudo leer el modelo guardado {ruta}: {e}")
+        return None
+    if entrada.get("huella") != huella_actual:
+        return None
+    return entrada
+
+
+# Se escribe primero en un archivo temporal para no dejar un modelo a medio guardar si el job se interrumpe
+def guardar_modelo(directorio, nombre, huella_actual, forecaster, metricas, tiempo_entrenamiento):
+    os.makedirs(directorio, exist_ok=True)
+    ruta = _ruta(directorio, nombre)
+    temporal = f"{ruta}.tmp"
+    joblib.dump({
+        "huella": huella_actual,
+        "forecaster": forecaster,
+        "metricas": metricas,
+        "tiempo_entrenamiento": tiempo_entrenamiento,
+    }, temporal)
+    os.replace(temporal, ruta)
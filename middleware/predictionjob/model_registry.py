@@ -0,0 +1,74 @@
+"""Regresores candidatos para los modelos de predicción.
+
+Están ordenados de menor a mayor costo esperado: con un presupuesto de tiempo limitado siempre se
+evalúan primero los más livianos y, como mínimo, la referencia estacional.
+"""
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import Ridge
+from threadpoolctl import ThreadpoolController
+
+RANDOM_STATE = 123
+
+# Bibliotecas de hilos cargadas (OpenMP de scikit-learn, BLAS de numpy); se detectan una sola vez
+CONTROLADOR_HILOS = ThreadpoolController()
+
+
+class NaiveEstacional(BaseEstimator, RegressorMixin):
+    """Referencia: predice el valor de hace `periodo` horas (el lag_periodo de la matriz de lags)."""
+
+    def __init__(self, periodo=24):
+        self.periodo = periodo
+
+    def fit(self, X, y):
+        self.n_features_in_ = np.asarray(X).shape[1]
+        return self
+
+    def predict(self, X):
+        X = np.asarray(X)
+        # Las columnas van de lag_1 a lag_n; si hay menos lags que el periodo se usa el más antiguo
+        return X[:, min(self.periodo, X.shape[1]) - 1]
+
+
+class HilosLimitados(BaseEstimator, RegressorMixin):
+    """Entrena y predice con `regresor` limitando a `n_jobs` los hilos de OpenMP, que sin límite usan todos los
+    núcleos aunque el pool de procesos ya los haya repartido."""
+
+    def __init__(self, regresor=None, n_jobs=1):
+        self.regresor = regresor
+        self.n_jobs = n_jobs
+
+    def fit(self, X, y):
+        with CONTROLADOR_HILOS.limit(limits=self.n_jobs, user_api="openmp"):
+            self.regresor_ = clone(self.regresor).fit(X, y)
+        self.n_features_in_ = self.regresor_.n_features_in_
+        return self
+
+    def predict(self, X):
+        with CONTROLADOR_HILOS.limit(limits=self.n_jobs, user_api="openmp"):
+            return self.regresor_.predict(X)
+
+
+CANDIDATOS = {
+    "NaiveEstacional": lambda n_jobs: NaiveEstacional(periodo=24),
+    "Ridge": lambda n_jobs: Ridge(alpha=1.0),
+    "HistGradientBoostingRegressor": lambda n_jobs: HilosLimitados(
+        HistGradientBoostingRegressor(random_state=RANDOM_STATE), n_jobs
+    ),
+    "RandomForestRegressor": lambda n_jobs: RandomForestRegressor(random_state=RANDOM_STATE, n_jobs=n_jobs),
+}
+
+
+def crear_regresor(nombre, n_jobs=1):
+    if nombre not in CANDIDATOS:
+        raise ValueError(f"Modelo desconocido: {nombre}")
+    return CANDIDATOS[nombre](n_jobs)
+
+
+# Hiperparámetros de un candidato (todos, incluidos los de los estimadores anidados) como texto, para la huella de
+# la caché de modelos: si se cambia un candidato, los modelos guardados con la definición anterior no se reusan.
+# Se toman con n_jobs=1 porque el reparto de núcleos no cambia el modelo entrenado
+def parametros_candidato(nombre):
+    parametros = crear_regresor(nombre, 1).get_params(deep=True)
+    return repr(sorted((clave, repr(valor)) for clave, valor in parametros.items()))
@@ -0,0 +1,96 @@
+"""Etapas de la corrida de predicción: lectura de la historia por hora (archivo y PostgreSQL), completado de
+huecos por entidad y entrenamiento con predicción de todas las series. Las usan app.py y el benchmark."""
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from archive import leer_archivo
+from forecasting import ejecutar_series, ejecutar_series_global
+from instrumentation import contar, tramo
+from resampling import a_dataframe, completar_horas
+
+COLUMNAS_LECTURAS = ["entity_id", "hour", "temperature", "humidity"]
+
+
+# Historia por hora de las entidades (None = todas las que tienen datos en el resumen) en los últimos
+# max_historia_dias días respecto a la hora más reciente de cada una. Los días cerrados se leen del archivo (solo
+# las columnas usadas, con memory-mapping, y solo los archivos posteriores a ahora - max_historia_dias; de una
+# entidad sin lecturas recientes no se lee su historia vieja) y a PostgreSQL se le piden solo las horas
+# posteriores al último día archivado de cada entidad
+def leer_historia(cursor_pg, tabla_horaria, entidades, max_historia_dias, archivo_dir=None, ahora=None):
+    df_archivo = pd.DataFrame(columns=COLUMNAS_LECTURAS)
+    archivado_hasta = {}
+    if archivo_dir:
+        with tramo("archive_read"):
+            tabla_archivo, archivado_hasta = leer_archivo(
+                archivo_dir, entidades, desde=(ahora or datetime.now()) - timedelta(days=max_historia_dias + 1),
+                columnas=["hour", "temp_avg", "hum_avg"]
+            )
+            df_archivo = tabla_archivo.to_pandas().rename(columns={"temp_avg": "temperature", "hum_avg": "humidity"})[COLUMNAS_LECTURAS]
+        contar("archive_read", filas=tabla_archivo.num_rows, bytes_=tabla_archivo.nbytes)
+
+    # Una fila por hora ya agregada, sin recorrer las lecturas crudas
+    query_hourly = f"""
+        SELECT r.entity_id, r.hour, r.temp_avg, r.hum_avg
+        FROM {tabla_horaria} r
+        JOIN (SELECT entity_id, MAX(hour) AS max_hour FROM {tabla_horaria} GROUP BY entity_id) m
+          ON m.entity_id = r.entity_id
+        LEFT JOIN unnest(%(archivadas)s::text[], %(cortes)s::timestamp[]) AS a(entity_id, corte)
+          ON a.entity_id = r.entity_id
+        WHERE r.hour >= m.max_hour - %(dias)s * interval '1 day'
+          AND (a.corte IS NULL OR r.hour >= a.corte)
+          AND (%(entidades)s::text[] IS NULL OR r.entity_id = ANY(%(entidades)s::text[]))
+        ORDER BY r.entity_id, r.hour;
+    """
+    with tramo("aggregate_query"):
+        cursor_pg.execute(query_hourly, {
+            "dias": max_historia_dias, "entidades": entidades,
+            "archivadas": list(archivado_hasta), "cortes": list(archivado_hasta.values()),
+        })
+        lecturas_hora = cursor_pg.fetchall()
+    contar("aggregate_query", filas=len(lecturas_hora))
+
+    # Archivo y ventana reciente juntos, con la misma ventana de max_historia_dias días por entidad que la consulta
+    df_lecturas = pd.concat([df_archivo, pd.DataFrame(lecturas_hora, columns=COLUMNAS_LECTURAS)], ignore_index=True)
+    df_lecturas = df_lecturas.astype({"temperature": float, "humidity": float})
+    df_lecturas["hour"] = pd.to_datetime(df_lecturas["hour"])
+    ultima_hora = df_lecturas.groupby("entity_id")["hour"].transform("max")
+    df_lecturas = df_lecturas[df_lecturas["hour"] >= ultima_hora - pd.Timedelta(days=max_historia_dias)]
+    return df_lecturas.sort_values(["entity_id", "hour"], ignore_index=True)
+
+
+# Por cada entidad, las variables se completan juntas sobre una única rejilla horaria continua y se conservan
+# solo las últimas max_historia_dias * 24 horas (ventana de entrenamiento acotada)
+def completar_entidades(df_lecturas, variables, max_historia_dias, politica="linear", max_hueco=None):
+    df_completos = {}
+    for entidad, df_horario in df_lecturas.groupby("entity_id", sort=True):
+        with tramo("gap_fill"):
+            horas, valores = completar_horas(
+                df_horario, variables, politica=politica, max_hueco=max_hueco, rellenar_bordes=True
+            )
+        contar("gap_fill", filas=len(horas))
+        df_completos[entidad] = a_dataframe(horas, valores, variables).tail(max_historia_dias * 24).reset_index(drop=True)
+    return df_completos
+
+
+# Entrena y predice cada serie (entidad, variable): un modelo por serie, cada una en su propio proceso, o un solo
+# modelo global predicho en lote. Devuelve (entidad, variable) -> resultado y una fila por entidad y hora con
+# las variables predichas
+def predecir_entidades(df_completos, variables, modo, max_lags, cache_dir, presupuesto_cpu=None, max_procesos=None,
+                       candidatos=None, presupuesto_seleccion=None):
+    claves = [(entidad, columna) for entidad in df_completos for columna in variables]
+    tareas = [(f"{entidad}_{columna}", df_completos[entidad], columna) for entidad, columna in claves]
+    if modo == "global":
+        resultados = ejecutar_series_global(tareas, max_lags, presupuesto_cpu)
+    else:
+        resultados = ejecutar_series(tareas, max_lags, cache_dir, presupuesto_cpu, max_procesos,
+                                     candidatos, presupuesto_seleccion)
+    resultados = dict(zip(claves, resultados))
+
+    df_futuros = []
+    for entidad in df_completos:
+        df_futuro = resultados[(entidad, variables[0])]["df_futuro"]
+        for columna in variables[1:]:
+            df_futuro = pd.merge(df_futuro, resultados[(entidad, columna)]["df_futuro"], on="hour", how="inner")
+        df_futuros.append(df_futuro.assign(entity_id=entidad))
+    return resultados, pd.concat(df_futuros, ignore_index=True)
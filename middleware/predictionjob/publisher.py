@@ -0,0 +1,134 @@
+"""Publicación de las predicciones por corridas.
+
+Cada corrida recibe un run_id en la tabla de corridas y sus filas se cargan con COPY en la tabla de
+predicciones, que conserva todas las corridas anteriores. La corrida vigente la indica un puntero de
+una sola fila que se actualiza al final de la misma transacción: los lectores (la vista de predicciones
+vigentes) siguen viendo la corrida anterior hasta el commit y nunca ven datos a medias ni esperan un TRUNCATE.
+"""
+import io
+
+from instrumentation import contar
+
+
+# Columnas agregadas a la tabla de predicciones
+COLUMNAS_PREDICCIONES = {"entity_id": "TEXT", "run_id": "BIGINT"}
+
+# Columnas agregadas a la tabla de métricas: la ventana usada (lags y horas de historia), el uso de la caché de
+# modelos, la evaluación con origen móvil y el costo de cada candidato (entrenamiento, predicción de 24 horas y
+# tamaño serializado)
+COLUMNAS_METRICAS = {
+    "lags": "INTEGER",
+    "history_hours": "INTEGER",
+    "cache_hit": "BOOLEAN",
+    "time_saved_s": "DOUBLE PRECISION",
+    "fold": "INTEGER",
+    "eval_time_s": "DOUBLE PRECISION",
+    "entity_id": "TEXT",
+    "fit_time_s": "DOUBLE PRECISION",
+    "predict_time_s": "DOUBLE PRECISION",
+    "model_size_bytes": "BIGINT",
+    "selected": "BOOLEAN",
+    "run_id": "BIGINT",
+}
+
+
+def _existe(cursor_pg, nombre):
+    cursor_pg.execute("SELECT to_regclass(%s) IS NOT NULL;", (nombre,))
+    return cursor_pg.fetchone()[0]
+
+
+# Agrega solo las columnas (nombre -> tipo) que le faltan a la tabla, sin ALTER TABLE si no falta ninguna.
+# Devuelve True si agregó alguna
+def _agregar_columnas(cursor_pg, tabla, columnas):
+    cursor_pg.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = %s;",
+        (tabla,)
+    )
+    existentes = {fila[0] for fila in cursor_pg.fetchall()}
+    faltantes = [columna for columna in columnas if columna not in existentes]
+    if faltantes:
+        cursor_pg.execute(f"ALTER TABLE {tabla} "
+                          + ", ".join(f"ADD COLUMN IF NOT EXISTS {columna} {columnas[columna]}" for columna in faltantes) + ";")
+    return bool(faltantes)
+
+
+# Crea la tabla de corridas, el puntero a la corrida vigente, la columna run_id en la tabla de predicciones y la
+# vista con las predicciones vigentes. ALTER TABLE y CREATE OR REPLACE VIEW toman un bloqueo exclusivo aunque no
+# cambien nada (esperan a las lecturas del dashboard y bloquean las siguientes), así que cada objeto se consulta
+# antes en el catálogo y solo se crea el que falta: en las corridas normales no se ejecuta DDL. Para cambiar la
+# definición de la vista hay que borrarla a mano. Devuelve True si creó algo
+def crear_tablas_publicacion(cursor_pg, tabla_predicciones, tabla_corridas, tabla_vigente, vista_vigente):
+    creado = False
+    if not _existe(cursor_pg, tabla_corridas):
+        cursor_pg.execute(f"""
+            CREATE TABLE IF NOT EXISTS {tabla_corridas} (
+                run_id BIGSERIAL PRIMARY KEY,
+                created_at TIMESTAMP NOT NULL DEFAULT now(),
+                model_mode TEXT,
+                n_rows INTEGER
+            );
+        """)
+        creado = True
+    if not _existe(cursor_pg, tabla_vigente):
+        cursor_pg.execute(f"""
+            CREATE TABLE IF NOT EXISTS {tabla_vigente} (
+                id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+                run_id BIGINT NOT NULL REFERENCES {tabla_corridas} (run_id),
+                published_at TIMESTAMP NOT NULL DEFAULT now()
+            );
+        """)
+        creado = True
+    if _agregar_columnas(cursor_pg, tabla_predicciones, COLUMNAS_PREDICCIONES):
+        creado = True
+    if not _existe(cursor_pg, f"{tabla_predicciones}_run_idx"):
+        cursor_pg.execute(f"CREATE INDEX IF NOT EXISTS {tabla_predicciones}_run_idx ON {tabla_predicciones} (run_id, entity_id, timestamp);")
+        creado = True
+    if not _existe(cursor_pg, vista_vigente):
+        cursor_pg.execute(f"""
+            CREATE OR REPLACE VIEW {vista_vigente} AS
+            SELECT p.entity_id, p.timestamp, p.temperature, p.humidity, p.run_id
+            FROM {tabla_predicciones} p
+            JOIN {tabla_vigente} v ON v.run_id = p.run_id;
+        """)
+        creado = True
+    return creado
+
+
+# Agrega a la tabla de métricas las columnas de COLUMNAS_METRICAS que le faltan. Devuelve True si agregó alguna
+def agregar_columnas_metricas(cursor_pg, tabla_metricas):
+    return _agregar_columnas(cursor_pg, tabla_metricas, COLUMNAS_METRICAS)
+
+
+# Buffer en formato CSV de COPY con una fila por entidad y hora: los valores con comas, comillas o saltos de línea
+# (p. ej. en entity_id) van entre comillas y los nulos quedan vacíos sin comillas
+def construir_buffer(df_futuro, run_id):
+    buffer = io.StringIO()
+    df_futuro.assign(run_id=run_id)[
+        ["run_id", "entity_id", "hour", "predicted_temperature", "predicted_humidity"]
+    ].to_csv(buffer, header=False, index=False, na_rep="")
+    buffer.seek(0)
+    return buffer
+
+
+# Registra la corrida, carga sus predicciones con COPY y mueve el puntero a la nueva corrida.
+# No hace commit: la publicación es atómica con el commit de quien la llama. Devuelve el run_id
+def publicar_predicciones(cursor_pg, df_futuro, tabla_predicciones, tabla_corridas, tabla_vigente, modo_modelo):
+    cursor_pg.execute(
+        f"INSERT INTO {tabla_corridas} (model_mode, n_rows) VALUES (%s, %s) RETURNING run_id;",
+        (modo_modelo, len(df_futuro))
+    )
+    run_id = cursor_pg.fetchone()[0]
+
+    buffer = construir_buffer(df_futuro, run_id)
+    contar("publish", filas=len(df_futuro), bytes_=buffer.seek(0, io.SEEK_END))
+    buffer.seek(0)
+    cursor_pg.copy_expert(
+        f"COPY {tabla_predicciones} (run_id, entity_id, timestamp, temperature, humidity) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+
+    cursor_pg.execute(f"""
+        INSERT INTO {tabla_vigente} (id, run_id, published_at) VALUES (TRUE, %s, now())
+        ON CONFLICT (id) DO UPDATE SET run_id = EXCLUDED.run_id, published_at = EXCLUDED.published_at;
+    """, (run_id,))
+    return run_id
@@ -0,0 +1,252 @@
+"""Archivo en Parquet del resumen por hora (hourly_readings) para los días cerrados.
+
+databaseloadjob escribe cada día cerrado en disco local, particionado por entidad y mes
+(<directorio>/entity_id=<entidad>/month=AAAA-MM/AAAAMMDD-AAAAMMDD.parquet, el nombre indica los días que
+cubre el archivo). Cuando un mes termina sus archivos se compactan en uno solo. Si una carga tardía cambia
+horas de un día ya archivado (updated_at del resumen posterior al pase anterior), en el pase siguiente se
+vuelve a escribir el mes de ese día.
+
+predictionjob y el dashboard leen de aquí la historia, solo con las columnas que usan y con memory-mapping,
+y piden a PostgreSQL únicamente las horas posteriores al último día archivado de cada entidad.
+"""
+import os
+import re
+from datetime import datetime, timedelta
+from urllib.parse import quote, unquote
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+ESQUEMA = pa.schema([
+    ("hour", pa.timestamp("us")),
+    ("temp_avg", pa.float64()),
+    ("temp_min", pa.float64()),
+    ("temp_max", pa.float64()),
+    ("temp_count", pa.int64()),
+    ("hum_avg", pa.float64()),
+    ("hum_min", pa.float64()),
+    ("hum_max", pa.float64()),
+    ("hum_count", pa.int64()),
+])
+
+PATRON_ARCHIVO = re.compile(r"^(\d{8})-(\d{8})\.parquet$")
+FORMATO_DIA = "%Y%m%d"
+
+# Hora de PostgreSQL al empezar el último pase de archivado; las horas del resumen escritas desde entonces se
+# vuelven a archivar. Una transacción que empezó antes de la marca puede confirmarse después: se revisa con margen
+ARCHIVO_MARCA = "_archivado_en"
+MARGEN_CAMBIOS = timedelta(minutes=30)
+
+
+def _directorio_entidad(directorio, entidad):
+    return os.path.join(directorio, f"entity_id={quote(entidad, safe='')}")
+
+
+def _directorio_mes(directorio, entidad, dia):
+    return os.path.join(_directorio_entidad(directorio, entidad), f"month={dia.year}-{dia.month:02d}")
+
+
+def _dia(texto):
+    return datetime.strptime(texto, FORMATO_DIA).date()
+
+
+# Fecha (o fecha y hora) como escalar de pyarrow comparable con la columna hour
+def _instante(valor):
+    if not isinstance(valor, datetime):
+        valor = datetime.combine(valor, datetime.min.time())
+    return pa.scalar(valor, type=pa.timestamp("us"))
+
+
+def _primer_dia_mes_siguiente(dia):
+    return (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+# Archivos de una entidad como (ruta, primer día, último día), ordenados por fecha
+def archivos_entidad(directorio, entidad):
+    base = _directorio_entidad(directorio, entidad)
+    if not os.path.isdir(base):
+        return []
+    archivos = []
+    for mes in os.listdir(base):
+        ruta_mes = os.path.join(base, mes)
+        if not mes.startswith("month=") or not os.path.isdir(ruta_mes):
+            continue
+        for nombre in os.listdir(ruta_mes):
+            coincidencia = PATRON_ARCHIVO.match(nombre)
+            if coincidencia:
+                archivos.append((os.path.join(ruta_mes, nombre), _dia(coincidencia.group(1)), _dia(coincidencia.group(2))))
+    return sorted(archivos, key=lambda archivo: archivo[1])
+
+
+def entidades_archivadas(directorio):
+    if not os.path.isdir(directorio):
+        return []
+    return sorted(unquote(nombre[len("entity_id="):]) for nombre in os.listdir(directorio) if nombre.startswith("entity_id="))
+
+
+# Primer día que todavía no está archivado para la entidad (None si no tiene nada archivado)
+def archivado_hasta(directorio, entidad):
+    archivos = archivos_entidad(directorio, entidad)
+    if not archivos:
+        return None
+    return max(ultimo for _, _, ultimo in archivos) + timedelta(days=1)
+
+
+def leer_marca(directorio):
+    ruta = os.path.join(directorio, ARCHIVO_MARCA)
+    if not os.path.isfile(ruta):
+        return None
+    with open(ruta) as archivo:
+        return datetime.fromisoformat(archivo.read().strip())
+
+
+def _guardar_marca(directorio, instante):
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, ARCHIVO_MARCA)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w") as archivo:
+        archivo.write(instante.isoformat())
+    os.replace(temporal, ruta)
+
+
+# Se escribe aparte y se renombra para que un lector nunca vea un archivo a medias
+def _escribir(tabla, ruta):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    pq.write_table(tabla, temporal, compression="zstd")
+    os.replace(temporal, ruta)
+
+
+def _escribir_dias(directorio, entidad, filas, primero, ultimo):
+    columnas = list(zip(*filas)) if filas else [[] for _ in ESQUEMA]
+    tabla = pa.Table.from_arrays([pa.array(columna, type=campo.type) for columna, campo in zip(columnas, ESQUEMA)], schema=ESQUEMA)
+    nombre = f"{primero.strftime(FORMATO_DIA)}-{ultimo.strftime(FORMATO_DIA)}.parquet"
+    _escribir(tabla, os.path.join(_directorio_mes(directorio, entidad, primero), nombre))
+    return tabla.num_rows
+
+
+def _archivos_mes(directorio, entidad, dia):
+    ruta_mes = _directorio_mes(directorio, entidad, dia)
+    return [archivo for archivo in archivos_entidad(directorio, entidad) if os.path.dirname(archivo[0]) == ruta_mes]
+
+
+def _filas_rollup(cursor_pg, tabla_rollup, entidad, desde, hasta):
+    cursor_pg.execute(f"""
+        SELECT hour, temp_avg, temp_min, temp_max, temp_count, hum_avg, hum_min, hum_max, hum_count
+        FROM {tabla_rollup}
+        WHERE entity_id = %s AND hour >= %s AND hour < %s
+        ORDER BY hour;
+    """, (entidad, desde, hasta))
+    return cursor_pg.fetchall()
+
+
+# Une en un solo archivo los archivos de un mes ya terminado
+def compactar_mes(directorio, entidad, dia):
+    ruta_mes = _directorio_mes(directorio, entidad, dia)
+    archivos = _archivos_mes(directorio, entidad, dia)
+    if len(archivos) < 2:
+        return False
+    tabla = pa.concat_tables([pq.read_table(ruta, memory_map=True) for ruta, _, _ in archivos])
+    nombre = f"{archivos[0][1].strftime(FORMATO_DIA)}-{archivos[-1][2].strftime(FORMATO_DIA)}.parquet"
+    _escribir(tabla.sort_by("hour"), os.path.join(ruta_mes, nombre))
+    for ruta, _, _ in archivos:
+        if os.path.basename(ruta) != nombre:
+            os.remove(ruta)
+    return True
+
+
+# Vuelve a escribir con los datos actuales del resumen los días archivados de un mes de la entidad, en un solo
+# archivo que cubre los mismos días. Devuelve las filas escritas
+def rearchivar_mes(cursor_pg, tabla_rollup, directorio, entidad, dia):
+    archivos = _archivos_mes(directorio, entidad, dia)
+    if not archivos:
+        return 0
+    primero, ultimo = archivos[0][1], max(fin for _, _, fin in archivos)
+    filas = _filas_rollup(cursor_pg, tabla_rollup, entidad, primero, ultimo + timedelta(days=1))
+    n_filas = _escribir_dias(directorio, entidad, filas, primero, ultimo)
+    nombre = f"{primero.strftime(FORMATO_DIA)}-{ultimo.strftime(FORMATO_DIA)}.parquet"
+    for ruta, _, _ in archivos:
+        if os.path.basename(ruta) != nombre:
+            os.remove(ruta)
+    return n_filas
+
+
+# Meses ya archivados con horas escritas en el resumen desde `desde`: se vuelven a archivar.
+# Devuelve entidad -> meses reescritos
+def rearchivar_cambios(cursor_pg, tabla_rollup, directorio, desde):
+    cursor_pg.execute(f"""
+        SELECT DISTINCT entity_id, hour::date FROM {tabla_rollup} WHERE updated_at >= %s ORDER BY 1, 2;
+    """, (desde,))
+    meses = {}
+    for entidad, dia in cursor_pg.fetchall():
+        hasta = archivado_hasta(directorio, entidad)
+        if hasta is not None and dia < hasta:
+            meses.setdefault(entidad, set()).add(dia.replace(day=1))
+    for entidad, dias in meses.items():
+        for dia in sorted(dias):
+            rearchivar_mes(cursor_pg, tabla_rollup, directorio, entidad, dia)
+    return {entidad: len(dias) for entidad, dias in meses.items()}
+
+
+# Archiva para cada entidad los días del resumen por hora que no estén archivados y sean anteriores a hasta_dia,
+# un archivo por mes. Los días sin lecturas también quedan cubiertos para no volver a consultarlos. Antes vuelve
+# a archivar los meses con horas cambiadas desde el pase anterior (en el primer pase no hay con qué comparar).
+# Devuelve entidad -> filas archivadas y entidad -> meses reescritos
+def archivar_rollup(cursor_pg, tabla_rollup, directorio, hasta_dia):
+    cursor_pg.execute("SELECT now()::timestamp;")
+    inicio = cursor_pg.fetchone()[0]
+    marca = leer_marca(directorio)
+    rearchivadas = rearchivar_cambios(cursor_pg, tabla_rollup, directorio, marca - MARGEN_CAMBIOS) if marca else {}
+
+    cursor_pg.execute(f"SELECT entity_id, MIN(hour) FROM {tabla_rollup} GROUP BY entity_id ORDER BY entity_id;")
+    archivadas = {}
+    for entidad, primera_hora in cursor_pg.fetchall():
+        dia = archivado_hasta(directorio, entidad) or primera_hora.date()
+        filas_entidad = 0
+        while dia < hasta_dia:
+            fin = min(_primer_dia_mes_siguiente(dia), hasta_dia)
+            filas = _filas_rollup(cursor_pg, tabla_rollup, entidad, dia, fin)
+            filas_entidad += _escribir_dias(directorio, entidad, filas, dia, fin - timedelta(days=1))
+            # El mes quedó completo: sus archivos diarios se unen en uno
+            if fin == _primer_dia_mes_siguiente(dia):
+                compactar_mes(directorio, entidad, dia)
+            dia = fin
+        archivadas[entidad] = filas_entidad
+    _guardar_marca(directorio, inicio)
+    return archivadas, rearchivadas
+
+
+# Lee del archivo las horas en [desde, hasta) de las entidades pedidas (None = todas), solo con las columnas
+# indicadas (None = todas). Devuelve una tabla de pyarrow con entity_id y las columnas, ordenada por entidad y
+# hora, y entidad -> primer día no archivado, desde donde hay que completar con PostgreSQL
+def leer_archivo(directorio, entidades=None, desde=None, hasta=None, columnas=None):
+    columnas = list(columnas or ESQUEMA.names)
+    if "hour" not in columnas:
+        columnas = ["hour"] + columnas
+    desde_dia = desde.date() if isinstance(desde, datetime) else desde
+    hasta_dia = hasta.date() if isinstance(hasta, datetime) else hasta
+
+    tablas = []
+    hasta_por_entidad = {}
+    for entidad in (entidades if entidades is not None else entidades_archivadas(directorio)):
+        archivos = archivos_entidad(directorio, entidad)
+        if not archivos:
+            continue
+        hasta_por_entidad[entidad] = max(ultimo for _, _, ultimo in archivos) + timedelta(days=1)
+        for ruta, primero, ultimo in archivos:
+            if (desde_dia is not None and ultimo < desde_dia) or (hasta_dia is not None and primero > hasta_dia):
+                continue
+            tabla = pq.read_table(ruta, columns=columnas, memory_map=True)
+            tablas.append(tabla.append_column("entity_id", pa.array([entidad] * tabla.num_rows, type=pa.string())))
+
+    if not tablas:
+        vacia = pa.schema([ESQUEMA.field(columna) for columna in columnas] + [("entity_id", pa.string())])
+        return vacia.empty_table(), hasta_por_entidad
+
+    tabla = pa.concat_tables(tablas)
+    if desde is not None:
+        tabla = tabla.filter(pc.greater_equal(tabla["hour"], _instante(desde)))
+    if hasta is not None:
+        tabla = tabla.filter(pc.less(tabla["hour"], _instante(hasta)))
+    return tabla.sort_by([("entity_id", "ascending"), ("hour", "ascending")]), hasta_por_entidad
@@ -0,0 +1,168 @@
+"""Instrumentación de las etapas: tramos con tiempo y contadores de filas y bytes.
+
+Los módulos registran sus etapas con `tramo("etapa")` y `contar("etapa", filas=..., bytes_=...)` sobre un
+registro global del proceso; cada aplicación lo nombra con `configurar("trabajo")`. El registro se exporta
+en el formato de texto de Prometheus: los jobs de cron lo escriben para el textfile collector de
+node_exporter o lo envían a un Pushgateway al terminar, y los servicios lo publican en /metrics.
+
+Lo usan databaseloadjob, predictionjob y el dashboard.
+"""
+import os
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+PREFIJO = "upbsmartiot"
+
+
+# Valor de etiqueta escapado como pide el formato de texto de Prometheus (barra invertida, comillas y salto de
+# línea); sin escapar, un solo valor con esos caracteres invalida todo el archivo o el envío al Pushgateway
+def _valor_etiqueta(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(etiquetas):
+    return ",".join(f'{clave}="{_valor_etiqueta(valor)}"' for clave, valor in etiquetas)
+
+
+class Registro:
+
+    def __init__(self, trabajo="app"):
+        self.trabajo = trabajo
+        self._lock = threading.Lock()
+        # (etapa, etiquetas) -> {"count", "sum", "max", "last", "errors"}
+        self._tramos = {}
+        # (etapa, etiquetas) -> {"rows", "bytes"}
+        self._contadores = {}
+
+    def _clave(self, etapa, etiquetas):
+        return etapa, tuple(sorted(etiquetas.items()))
+
+    def registrar(self, etapa, segundos, error=False, **etiquetas):
+        with self._lock:
+            tramo = self._tramos.setdefault(
+                self._clave(etapa, etiquetas), {"count": 0, "sum": 0.0, "max": 0.0, "last": 0.0, "errors": 0}
+            )
+            tramo["count"] += 1
+            tramo["sum"] += segundos
+            tramo["max"] = max(tramo["max"], segundos)
+            tramo["last"] = segundos
+            if error:
+                tramo["errors"] += 1
+
+    @contextmanager
+    def tramo(self, etapa, **etiquetas):
+        inicio = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.registrar(etapa, time.perf_counter() - inicio, error, **etiquetas)
+
+    def contar(self, etapa, filas=0, bytes_=0, **etiquetas):
+        with self._lock:
+            contador = self._contadores.setdefault(self._clave(etapa, etiquetas), {"rows": 0, "bytes": 0})
+            contador["rows"] += filas
+            contador["bytes"] += bytes_
+
+    # Texto en el formato de exposición de Prometheus (versión 0.0.4)
+    def exposicion(self):
+        with self._lock:
+            tramos = {clave: dict(valor) for clave, valor in self._tramos.items()}
+            contadores = {clave: dict(valor) for clave, valor in self._contadores.items()}
+
+        lineas = []
+
+        def metrica(nombre, tipo, ayuda, muestras):
+            lineas.append(f"# HELP {PREFIJO}_{nombre} {ayuda}")
+            lineas.append(f"# TYPE {PREFIJO}_{nombre} {tipo}")
+            for sufijo, (etapa, etiquetas), valor in muestras:
+                todas = (("job", self.trabajo), ("stage", etapa)) + etiquetas
+                lineas.append(f"{PREFIJO}_{nombre}{sufijo}{{{_etiquetas(todas)}}} {valor}")
+
+        metrica("stage_duration_seconds", "summary", "Duración de cada etapa",
+                [(sufijo, clave, t[campo]) for clave, t in sorted(tramos.items())
+                 for sufijo, campo in (("_sum", "sum"), ("_count", "count"))])
+        metrica("stage_duration_max_seconds", "gauge", "Duración máxima de la etapa",
+                [("", clave, t["max"]) for clave, t in sorted(tramos.items())])
+        metrica("stage_last_duration_seconds", "gauge", "Duración de la última ejecución de la etapa",
+                [("", clave, t["last"]) for clave, t in sorted(tramos.items())])
+        metrica("stage_errors_total", "counter", "Ejecuciones de la etapa que terminaron con error",
+                [("", clave, t["errors"]) for clave, t in sorted(tramos.items())])
+        metrica("rows_total", "counter", "Filas procesadas por la etapa",
+                [("", clave, c["rows"]) for clave, c in sorted(contadores.items())])
+        metrica("bytes_total", "counter", "Bytes procesados por la etapa",
+                [("", clave, c["bytes"]) for clave, c in sorted(contadores.items())])
+        lineas.append(f"# TYPE {PREFIJO}_last_run_timestamp_seconds gauge")
+        lineas.append(f'{PREFIJO}_last_run_timestamp_seconds{{job="{self.trabajo}"}} {time.time()}')
+        return "\n".join(lineas) + "\n"
+
+    # Archivo <trabajo>.prom para el textfile collector; se escribe aparte y se renombra para no leerlo a medias
+    def escribir_textfile(self, directorio):
+        ruta = os.path.join(directorio, f"{self.trabajo}.prom")
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "w") as archivo:
+            archivo.write(self.exposicion())
+        os.replace(temporal, ruta)
+        return ruta
+
+    # Reemplaza las métricas del trabajo en el Pushgateway
+    def enviar_pushgateway(self, url):
+        solicitud = urllib.request.Request(
+            f"{url.rstrip('/')}/metrics/job/{self.trabajo}",
+            data=self.exposicion().encode("utf-8"),
+            headers={"Content-Type": "text/plain; version=0.0.4"},
+            method="PUT",
+        )
+        with urllib.request.urlopen(solicitud, timeout=10) as respuesta:
+            return respuesta.status
+
+    def resumen(self):
+        with self._lock:
+            tramos = sorted(self._tramos.items())
+            contadores = dict(self._contadores)
+        lineas = []
+        for clave, t in tramos:
+            etapa, etiquetas = clave
+            nombre = etapa + (f"[{_etiquetas(etiquetas)}]" if etiquetas else "")
+            contador = contadores.get(clave, {})
+            extra = f", {contador['rows']} filas, {contador['bytes']} bytes" if contador else ""
+            lineas.append(f"  {nombre}: {t['sum']:.3f} s en {t['count']} tramos (máx {t['max']:.3f} s){extra}")
+        return "\n".join(lineas)
+
+    # Al final de un job: imprime el resumen y exporta a los destinos configurados; un error al exportar
+    # no hace fallar al job
+    def exportar(self, directorio_textfile=None, url_pushgateway=None):
+        print(f"Etapas de {self.trabajo}:\n{self.resumen()}")
+        try:
+            if directorio_textfile:
+                print(f"Métricas escritas en {self.escribir_textfile(directorio_textfile)}")
+            if url_pushgateway:
+                self.enviar_pushgateway(url_pushgateway)
+                print(f"Métricas enviadas a {url_pushgateway}")
+        except Exception as e:
+            print(f"No se pudieron exportar las métricas: {e}")
+
+
+REGISTRO = Registro()
+
+
+def configurar(trabajo):
+    REGISTRO.trabajo = trabajo
+    return REGISTRO
+
+
+def tramo(etapa, **etiquetas):
+    return REGISTRO.tramo(etapa, **etiquetas)
+
+
+def registrar(etapa, segundos, error=False, **etiquetas):
+    REGISTRO.registrar(etapa, segundos, error, **etiquetas)
+
+
+def contar(etapa, filas=0, bytes_=0, **etiquetas):
+    REGISTRO.contar(etapa, filas, bytes_, **etiquetas)
@@ -0,0 +1,80 @@
+"""Completado de huecos en series horarias.
+
+Las horas se alinean con un único DatetimeIndex (reindex) y los huecos se rellenan de forma
+vectorizada para todas las columnas a la vez. Lo usan predictionjob y el dashboard.
+"""
+import numpy as np
+import pandas as pd
+
+# Políticas para rellenar huecos: interpolación lineal, repetir el último valor o dejarlos vacíos
+POLITICAS = ("linear", "ffill", "none")
+
+
+# Rejilla horaria continua; con dias_completos va de las 00:00 del primer día a las 23:00 del último
+def rejilla_horaria(inicio, fin, dias_completos=True):
+    inicio = pd.Timestamp(inicio)
+    fin = pd.Timestamp(fin)
+    if dias_completos:
+        inicio = inicio.floor("D")
+        fin = fin.floor("D") + pd.Timedelta(hours=23)
+    return pd.date_range(start=inicio.floor("h"), end=fin.floor("h"), freq="h")
+
+
+# Marca los valores faltantes que pertenecen a huecos de más de max_hueco horas seguidas
+def _huecos_largos(faltantes, max_hueco):
+    largos = np.zeros_like(faltantes)
+    for j in range(faltantes.shape[1]):
+        columna = faltantes[:, j]
+        # Identificador de cada tramo: cambia cada vez que aparece un valor presente
+        tramo = np.cumsum(~columna)
+        longitudes = np.bincount(tramo, weights=columna)
+        largos[:, j] = columna & (longitudes[tramo] > max_hueco)
+    return largos
+
+
+def rellenar(valores, politica="linear", max_hueco=None, rellenar_bordes=False):
+    if politica not in POLITICAS:
+        raise ValueError(f"Política de huecos desconocida: {politica}")
+    faltantes = valores.isna().to_numpy()
+    if politica == "linear":
+        completos = valores.interpolate(method="linear")
+    elif politica == "ffill":
+        completos = valores.ffill()
+    else:
+        completos = valores.copy()
+
+    # Los huecos más largos que max_hueco se dejan vacíos en lugar de inventar datos
+    if max_hueco is not None and politica != "none":
+        completos = completos.mask(_huecos_largos(faltantes, max_hueco))
+
+    # Si quedan valores nulos al principio o al final, se rellenan con ffill o bfill
+    if rellenar_bordes:
+        completos = completos.ffill().bfill()
+    return completos
+
+
+# Alinea las columnas de df (con columna 'hour') a una rejilla horaria continua y rellena los huecos.
+# Devuelve las horas y una matriz NumPy contigua (float64) con una columna por serie
+def completar_horas(df, columnas, politica="linear", max_hueco=None, rellenar_bordes=False,
+                    inicio=None, fin=None, dias_completos=True):
+    valores = df.set_index("hour")[list(columnas)].astype("float64")
+    if not valores.index.is_unique:
+        valores = valores.groupby(level=0).mean()
+    valores = valores.sort_index()
+
+    if len(valores) == 0 and (inicio is None or fin is None):
+        return pd.DatetimeIndex([]), np.empty((0, len(columnas)))
+    if inicio is None:
+        inicio = valores.index.min()
+    if fin is None:
+        fin = valores.index.max()
+    horas = rejilla_horaria(inicio, fin, dias_completos)
+
+    completos = rellenar(valores.reindex(horas), politica, max_hueco, rellenar_bordes)
+    return horas, np.ascontiguousarray(completos.to_numpy(dtype=np.float64))
+
+
+def a_dataframe(horas, valores, columnas):
+    df = pd.DataFrame(valores, columns=list(columnas))
+    df.insert(0, "hour", horas)
+    return df